@@ -1,61 +1,417 @@
 import pandas as pd
 import numpy as np
+import codecs
+import os
 from datetime import datetime
 from tqdm import tqdm
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import multiprocessing
-from openpyxl.styles import PatternFill, Font, Alignment
-from openpyxl.utils import get_column_letter
+from multiprocessing import shared_memory
+from cache_colonnes import charger_avec_cache
+from export_resultats import exporter
+from regression_prix import ModelePrix
+from doublons_annonces import SEUIL_SIMILARITE, detecter_reposts, regrouper_reposts
+from resultats_affaires import TYPES_AFFAIRES, ResultatsAffaires
+from instrumentation import Metriques, mesurer_etape
+
+FENETRE_ANNEES = 2  # Écart d'années maximal entre un véhicule et ses comparables
+SEUIL_SCORE_VALUE = 0.25  # Score minimal pour un "bon rapport qualité-prix"
+RATIO_PRIX_ANOMALIE = 0.75  # Prix anormalement bas : sous 75 % du prix prédit
+TAILLE_MIN_GROUPE_ANOMALIE = 3  # Annonces minimales d'un (Marque, Modele) pour détecter des anomalies
+ECART_TYPE_MAX_ANOMALIE = 10_000  # Seuil pour exclure les groupes très variables
+VERSION_NETTOYAGE = 2  # À incrémenter à chaque changement des règles de nettoyage (invalide le cache)
+VERSION_CACHE_CHUNKS = f"v{VERSION_NETTOYAGE}-chunks"  # Entrées du cache écrites par charger_donnees_par_chunks
+VERSION_CACHE_CHUNKS_TEXTE = f"v{VERSION_NETTOYAGE}-chunks-texte"  # Idem avec les colonnes de SCHEMA_CSV_TEXTE
+VERSION_CACHE_COMPLET = f"v{VERSION_NETTOYAGE}-complet"
+
+# Schéma de lecture basse mémoire : seules les colonnes utilisées par l'analyse sont lues
+SCHEMA_CSV = {
+    'ID': str,
+    'Prix': str,
+    'Marque': 'category',
+    'Modele': 'category',
+    'Année': str,
+    'Kilométrage': str,
+    'Carburant': 'category',
+    'Boite': 'category',
+    'Puissance din': str,
+    'URL': str,
+}
+SCHEMA_CSV_TEXTE = {'Titre': str, 'Description': str, 'Ville': 'category'}  # Textes comparés par regrouper_reposts
+COLONNES_CHIFFRES = ['Prix', 'Kilométrage', 'Puissance din']  # Valeurs du type "110 Ch"
+TYPES_NUMERIQUES = {
+    'ID': 'integer',
+    'Prix': 'integer',
+    'Kilométrage': 'integer',
+    'Année': 'integer',
+    'Puissance din': 'float',
+}
+
+
+def _detecter_encodage(fichier_csv, taille_echantillon=1 << 20):
+    """Détecte l'encodage du fichier une seule fois, sur son premier mégaoctet"""
+    with open(fichier_csv, 'rb') as f:
+        echantillon = f.read(taille_echantillon)
+    if echantillon.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        # final=False : un caractère coupé en fin d'échantillon n'est pas une erreur
+        codecs.getincrementaldecoder('utf-8')().decode(echantillon, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'latin1'
+
+
+def _extraire_chiffres(valeurs):
+    """Convertit des textes en nombres en ne gardant que leurs chiffres et leur point ("110 Ch" -> 110)
+
+    Même règle que pd.to_numeric(texte.str.replace('[^0-9.]', '')) : "12.5" -> 12.5, NaN
+    sans chiffre ou avec plusieurs points. Les textes sont vus comme une matrice de points
+    de code UCS-4 et le nombre reconstruit par puissances de 10, sans expression régulière.
+    """
+    texte = np.asarray(valeurs.fillna('').to_numpy(dtype=str), dtype=str)
+    largeur = texte.dtype.itemsize // 4
+    if len(texte) == 0 or largeur == 0:
+        return pd.Series(np.nan, index=valeurs.index)
+
+    codes = texte.view(np.uint32).reshape(len(texte), largeur)
+    est_chiffre = (codes >= 48) & (codes <= 57)
+    est_point = codes == 46
+    # Nombre de chiffres situés à droite de chaque position
+    rang = np.cumsum(est_chiffre[:, ::-1], axis=1)[:, ::-1] - est_chiffre
+    # Chiffres après le point : la partie entière est divisée par 10 ** decimales
+    position_point = np.where(est_point.any(axis=1), est_point.argmax(axis=1), largeur)
+    decimales = (est_chiffre & (np.arange(largeur) > position_point[:, None])).sum(axis=1)
+    nombres = (np.where(est_chiffre, codes - 48, 0) * 10.0 ** rang).sum(axis=1) / 10.0 ** decimales
+    nombres[~est_chiffre.any(axis=1) | (est_point.sum(axis=1) > 1)] = np.nan
+    return pd.Series(nombres, index=valeurs.index)
+
+
+def _chiffres_colonne(valeurs):
+    """Nombres d'une colonne brute : textes réduits à leurs chiffres, nombres gardés tels quels"""
+    if valeurs.dtype != object:
+        if pd.api.types.is_numeric_dtype(valeurs):
+            return valeurs.astype(float)
+        return _extraire_chiffres(valeurs)
+    # Colonne mixte (annonces JSON) : seuls les textes passent par l'extraction de chiffres
+    textes = np.fromiter((isinstance(valeur, str) for valeur in valeurs), dtype=bool, count=len(valeurs))
+    nombres = pd.to_numeric(valeurs.where(~textes), errors='coerce').astype(float)
+    if textes.any():
+        nombres[textes] = _extraire_chiffres(valeurs[textes])
+    return nombres
+
+
+def nettoyer_annonces(brut, metriques=None):
+    """Nettoie des annonces brutes aux colonnes de SCHEMA_CSV (règles de VERSION_NETTOYAGE)
+
+    Les textes de COLONNES_CHIFFRES sont réduits à leurs chiffres ("110 Ch" -> 110,
+    "12.5" -> 12.5), les nombres déjà numériques (JSON) gardés tels quels ; les annonces
+    sans prix, kilométrage ou année valides sont retirées. brut est modifié sur place.
+    """
+    for colonne in COLONNES_CHIFFRES:
+        if colonne in brut.columns:
+            brut[colonne] = _chiffres_colonne(brut[colonne])
+    for colonne in ['ID', 'Année']:
+        if colonne in brut.columns:
+            brut[colonne] = pd.to_numeric(brut[colonne], errors='coerce')
+    df = brut[(brut['Prix'] > 0) & (brut['Kilométrage'] > 0) & (brut['Année'] > 0)]
+    if metriques is not None:
+        metriques.compter('lignes_rejetees', len(brut) - len(df))
+    return df
+
+
+def _reduire_types(df):
+    """Descend les colonnes numériques vers le plus petit type sans perte"""
+    for colonne, type_cible in TYPES_NUMERIQUES.items():
+        if colonne in df.columns:
+            df[colonne] = pd.to_numeric(df[colonne], downcast=type_cible)
+    return df
+
+
+def _concatener_categoriels(morceaux, **options):
+    """Concatène des DataFrames dont les colonnes catégorielles ont des catégories différentes
+
+    Les catégories sont unifiées (union_categoricals) avant pd.concat, qui sinon
+    repasserait ces colonnes en object.
+    """
+    for colonne in morceaux[0].columns:
+        if isinstance(morceaux[0][colonne].dtype, pd.CategoricalDtype):
+            categories = pd.api.types.union_categoricals([m[colonne] for m in morceaux]).categories
+            for morceau in morceaux:
+                morceau[colonne] = morceau[colonne].cat.set_categories(categories)
+    return pd.concat(morceaux, **options)
+
+
+def charger_donnees_par_chunks(fichier_csv, taille_chunk=100_000, metriques=None, colonnes_texte=False):
+    """Charge les données par morceaux avec un schéma explicite
+
+    Seules les colonnes de SCHEMA_CSV sont lues (pas de Description, sauf avec
+    colonnes_texte qui ajoute SCHEMA_CSV_TEXTE), les marques, modèles, carburants et
+    boîtes sont catégoriels et les nombres réduits au plus petit type. Chaque morceau
+    est nettoyé et filtré avant d'être conservé.
+    """
+    metriques = metriques or Metriques()
+    schema = {**SCHEMA_CSV, **SCHEMA_CSV_TEXTE} if colonnes_texte else SCHEMA_CSV
+    encodage = _detecter_encodage(fichier_csv)
+    lecteur = pd.read_csv(
+        fichier_csv,
+        encoding=encodage,
+        usecols=lambda colonne: colonne in schema,
+        dtype=schema,
+        chunksize=taille_chunk,
+    )
+
+    morceaux = []
+    for morceau in metriques.barre(lecteur, desc="Lecture par morceaux", unit="chunk"):
+        metriques.compter('lignes_lues', len(morceau))
+        morceaux.append(nettoyer_annonces(morceau, metriques))
+
+    if not morceaux:
+        return pd.DataFrame(columns=list(schema))
+    return _reduire_types(_concatener_categoriels(morceaux))
+
+
+def _codes_groupes(df):
+    """Numérote les groupes (Marque, Modele), -1 si la marque ou le modèle manque"""
+    codes = df.groupby(['Marque', 'Modele'], sort=False, dropna=True, observed=True).ngroup()
+    return codes.fillna(-1).to_numpy(dtype=np.int64, copy=True)
+
+
+def _scores_fenetre_triee(codes, annees, prix, km, fenetre=FENETRE_ANNEES):
+    """Calcule les scores qualité-prix sur des tableaux triés par (groupe, année)
+
+    Les comparables d'une ligne sont les lignes du même groupe à ±fenetre ans :
+    leurs bornes s'obtiennent par searchsorted sur une clé (rang du groupe, année)
+    et les moyennes de prix et de kilométrage par différence de sommes cumulées.
+    """
+    n = len(codes)
+    scores = np.zeros(n)
+    if n == 0:
+        return scores
+
+    # Clé croissante : chaque groupe occupe une plage d'années disjointe des autres
+    nouveau_groupe = np.r_[True, codes[1:] != codes[:-1]]
+    rang = np.cumsum(nouveau_groupe) - 1
+    annee_min = annees.min()
+    pas = (annees.max() - annee_min) + 2 * fenetre + 1
+    cle = rang * pas + (annees - annee_min)
+
+    bas = np.searchsorted(cle, cle - fenetre, side='left')
+    haut = np.searchsorted(cle, cle + fenetre, side='right')
+    nombre = haut - bas
+
+    cumul_prix = np.r_[0.0, np.cumsum(prix)]
+    cumul_km = np.r_[0.0, np.cumsum(km)]
+    prix_moyen = (cumul_prix[haut] - cumul_prix[bas]) / nombre
+    km_moyen = (cumul_km[haut] - cumul_km[bas]) / nombre
+
+    valides = (codes >= 0) & (nombre >= 2)
+    prix_km_moyen = prix_moyen[valides] / km_moyen[valides]
+    scores[valides] = 1 - (prix[valides] / km[valides]) / prix_km_moyen
+    return scores
+
+
+def _decouper_par_groupe(codes_tries, n_shards):
+    """Découpe des tableaux triés en plages contiguës sans jamais couper un groupe"""
+    n = len(codes_tries)
+    debuts = np.flatnonzero(np.r_[True, codes_tries[1:] != codes_tries[:-1]])
+    cibles = np.searchsorted(debuts, np.linspace(0, n, n_shards + 1)[1:-1])
+    coupes = np.where(cibles < len(debuts), debuts[np.minimum(cibles, len(debuts) - 1)], n)
+    bornes = np.unique(np.r_[0, coupes, n])
+    return list(zip(bornes[:-1], bornes[1:]))
+
+
+def _attacher_memoire(nom):
+    """Ouvre le bloc de mémoire partagée du processus parent, seul chargé de le libérer"""
+    try:
+        return shared_memory.SharedMemory(name=nom, track=False)
+    except TypeError:  # Python < 3.13 : le worker partage le resource tracker du parent
+        return shared_memory.SharedMemory(name=nom)
+
+
+def _scores_shard(nom_memoire, n, debut, fin):
+    """Worker : calcule les scores des lignes [debut, fin) du bloc partagé"""
+    memoire = _attacher_memoire(nom_memoire)
+    try:
+        colonnes = np.ndarray((5, n), dtype=np.float64, buffer=memoire.buf)
+        codes, annees, prix, km, scores = colonnes[:, debut:fin]
+        scores[:] = _scores_fenetre_triee(codes.astype(np.int64), annees, prix, km)
+        del colonnes, codes, annees, prix, km, scores
+    finally:
+        memoire.close()
+    return fin - debut
+
+
+def _scores_multi_processus(codes, annees, prix, km, n_workers=None, progression=True):
+    """Calcule les scores dans un pool de processus, un shard par paquet de groupes
+
+    Les colonnes triées sont copiées une fois dans un bloc de mémoire partagée :
+    les workers y lisent leur plage et y écrivent leurs scores, rien n'est picklé.
+    Retombe sur le calcul en série si le pool ou la mémoire partagée échoue.
+    """
+    n_workers = n_workers or multiprocessing.cpu_count()
+    n = len(codes)
+    shards = _decouper_par_groupe(codes, n_workers * 4) if n else []
+    if n_workers <= 1 or len(shards) <= 1:
+        return _scores_fenetre_triee(codes, annees, prix, km)
+
+    try:
+        memoire = shared_memory.SharedMemory(create=True, size=5 * n * 8)
+    except OSError as e:
+        print(f"Mémoire partagée indisponible ({e}), calcul en série")
+        return _scores_fenetre_triee(codes, annees, prix, km)
+
+    try:
+        colonnes = np.ndarray((5, n), dtype=np.float64, buffer=memoire.buf)
+        colonnes[0], colonnes[1], colonnes[2], colonnes[3] = codes, annees, prix, km
+        colonnes[4] = 0
+        try:
+            with ProcessPoolExecutor(max_workers=min(n_workers, len(shards))) as executor:
+                futures = [executor.submit(_scores_shard, memoire.name, n, debut, fin)
+                           for debut, fin in shards]
+                # Chaque shard écrit sa propre plage : l'ordre du résultat est fixe
+                for future in tqdm(futures, desc="Traitement des shards", disable=not progression):
+                    future.result()
+            scores = colonnes[4].copy()
+        except (OSError, BrokenProcessPool) as e:
+            print(f"Échec du pool de processus ({e}), calcul en série")
+            scores = _scores_fenetre_triee(codes, annees, prix, km)
+        del colonnes
+    finally:
+        memoire.close()
+        memoire.unlink()
+    return scores
+
 
 class AnalyseurVoitures:
-    def __init__(self, fichier_csv):
-        """Initialise l'analyseur avec le fichier CSV"""
+    def __init__(self, fichier_csv, basse_memoire=False, taille_chunk=100_000, dossier_cache=None,
+                 metriques=None, fichier_modele_prix=None):
+        """Initialise l'analyseur avec le fichier CSV
+
+        basse_memoire=True lit le fichier par morceaux typés (voir charger_donnees_par_chunks).
+        dossier_cache active le cache colonnaire des données nettoyées (voir cache_colonnes).
+        metriques (instrumentation.Metriques) reçoit les mesures de chaque étape.
+        fichier_modele_prix conserve les coefficients de régression des prix : s'il existe,
+        ils sont réutilisés sans nouvel ajustement (voir modele_prix_ajuste).
+        """
+        self.metriques = metriques or Metriques()
+        self.fichier_modele_prix = fichier_modele_prix
+        self.modele_prix = None
         print("Chargement des données...")
-        self.df = self._charger_donnees(fichier_csv)
+        if basse_memoire:
+            charger = lambda fichier: charger_donnees_par_chunks(fichier, taille_chunk, self.metriques)
+            version = VERSION_CACHE_CHUNKS
+        else:
+            charger = self._charger_donnees
+            version = VERSION_CACHE_COMPLET
+
+        with self.metriques.etape('chargement'):
+            if dossier_cache:
+                self.df = charger_avec_cache(fichier_csv, charger, version, dossier_cache)
+            else:
+                self.df = charger(fichier_csv)
+            self.metriques.compter('lignes_chargees', len(self.df))
         self.prix_moyens_marche = {}
+        self._agregats = None
         print(f"Données chargées : {len(self.df)} véhicules trouvés")
+
+    @classmethod
+    def depuis_dataframe(cls, df, metriques=None, modele_prix=None):
+        """Crée un analyseur sur un DataFrame déjà chargé et nettoyé"""
+        analyseur = cls.__new__(cls)
+        analyseur.metriques = metriques or Metriques()
+        analyseur.fichier_modele_prix = None
+        analyseur.modele_prix = modele_prix
+        analyseur.df = df
+        analyseur.prix_moyens_marche = {}
+        analyseur._agregats = None
+        return analyseur
         
     def _charger_donnees(self, fichier_csv):
         """Charge et nettoie les données avec indication de progression"""
-        try:
-            df = pd.read_csv(fichier_csv, encoding='utf-8')
-        except UnicodeDecodeError:
-            df = pd.read_csv(fichier_csv, encoding='latin1')
+        with self.metriques.etape('lecture'):
+            try:
+                df = pd.read_csv(fichier_csv, encoding='utf-8')
+            except UnicodeDecodeError:
+                df = pd.read_csv(fichier_csv, encoding='latin1')
+            self.metriques.compter('lignes_lues', len(df))
         
-        print("Nettoyage des données...")
-        for colonne in ['Prix', 'Kilométrage', 'Puissance din', 'Année']:
-            if colonne in df.columns:
-                print(f"Traitement de la colonne {colonne}...")
-                if colonne in ['Prix', 'Kilométrage', 'Puissance din']:
-                    df[colonne] = pd.to_numeric(df[colonne].astype(str).str.replace('[^0-9.]', '', regex=True), errors='coerce')
-                else:
-                    df[colonne] = pd.to_numeric(df[colonne], errors='coerce')
-
-        # Supprimer les valeurs invalides
-        print("Validation des données...")
-        df = df[df['Prix'] > 0]
-        df = df[df['Kilométrage'] > 0]
-        df = df[df['Année'] > 0]
+        with self.metriques.etape('nettoyage'):
+            print("Nettoyage des données...")
+            for colonne in ['Prix', 'Kilométrage', 'Puissance din', 'Année']:
+                if colonne in df.columns:
+                    print(f"Traitement de la colonne {colonne}...")
+                    if colonne in COLONNES_CHIFFRES:
+                        df[colonne] = _chiffres_colonne(df[colonne])
+                    else:
+                        df[colonne] = pd.to_numeric(df[colonne], errors='coerce')
+
+            # Supprimer les valeurs invalides
+            print("Validation des données...")
+            lignes_lues = len(df)
+            df = df[df['Prix'] > 0]
+            df = df[df['Kilométrage'] > 0]
+            df = df[df['Année'] > 0]
+            self.metriques.compter('lignes_rejetees', lignes_lues - len(df))
 
         return df
-    
+
+    @mesurer_etape('reposts')
+    def regrouper_reposts(self, seuil=SEUIL_SIMILARITE):
+        """Regroupe les reposts d'une même voiture et ne garde que l'annonce la plus récente
+
+        Les groupes sont détectés par MinHash/LSH sur le titre, la description, la ville
+        et les attributs (voir doublons_annonces). Les colonnes Groupe_repost et
+        Nombre_reposts sont ajoutées ; retourne le nombre d'annonces retirées.
+        """
+        print("\nDétection des reposts...")
+        groupes = detecter_reposts(self.df, seuil)
+        df = regrouper_reposts(self.df.assign(Groupe_repost=groupes), groupes)
+        df['Nombre_reposts'] = np.bincount(groupes)[df['Groupe_repost'].to_numpy()]
+        retirees = len(self.df) - len(df)
+        self.metriques.compter('reposts_retires', retirees)
+        print(f"{retirees} reposts regroupés, {len(df)} annonces conservées")
+        self.df = df
+        self._agregats = None
+        return retirees
+
+    def agregats_modeles(self):
+        """Statistiques par (Marque, Modele) en un seul groupby, calculées une fois
+
+        Partagées par analyser_tendances_marche et les feuilles de l'export.
+        """
+        if self._agregats is None:
+            self._agregats = (self.df.groupby(['Marque', 'Modele'], observed=True)
+                              .agg(nombre_annonces=('Prix', 'size'),
+                                   nombre_prix=('Prix', 'count'),
+                                   prix_moyen=('Prix', 'mean'),
+                                   prix_median=('Prix', 'median'),
+                                   ecart_type_prix=('Prix', 'std'),
+                                   prix_min=('Prix', 'min'),
+                                   prix_max=('Prix', 'max'),
+                                   km_moyen=('Kilométrage', 'mean'),
+                                   annee_moyenne=('Année', 'mean')))
+        return self._agregats
+
+    @mesurer_etape('tendances')
     def analyser_tendances_marche(self):
         """Analyse les tendances du marché pour chaque modèle"""
         tendances = {}
-        
-        for (marque, modele), groupe in self.df.groupby(['Marque', 'Modele']):
-            if len(groupe) < 3:
-                continue
-                
+        agregats = self.agregats_modeles()
+        annee_courante = datetime.now().year
+        self.metriques.compter('groupes_ignores', (agregats['nombre_annonces'] < 3).sum())
+
+        for (marque, modele), groupe in agregats[agregats['nombre_annonces'] >= 3].iterrows():
             tendances[f"{marque} {modele}"] = {
-                'prix_moyen': groupe['Prix'].mean(),
-                'prix_median': groupe['Prix'].median(),
-                'ecart_type_prix': groupe['Prix'].std(),
-                'km_moyen': groupe['Kilométrage'].mean(),
-                'age_moyen': datetime.now().year - groupe['Année'].mean(),
-                'nombre_annonces': len(groupe),
-                'prix_min': groupe['Prix'].min(),
-                'prix_max': groupe['Prix'].max(),
+                'prix_moyen': groupe['prix_moyen'],
+                'prix_median': groupe['prix_median'],
+                'ecart_type_prix': groupe['ecart_type_prix'],
+                'km_moyen': groupe['km_moyen'],
+                'age_moyen': annee_courante - groupe['annee_moyenne'],
+                'nombre_annonces': int(groupe['nombre_annonces']),
+                'prix_min': groupe['prix_min'],
+                'prix_max': groupe['prix_max'],
             }
             
         return tendances
@@ -80,199 +436,287 @@ class AnalyseurVoitures:
         
         return score
 
+    @mesurer_etape('scores')
+    def calculer_scores_value(self, execution='serie', n_workers=None):
+        """Calcule le score qualité-prix de tous les véhicules en une seule passe
+
+        Équivalent vectorisé de calculer_score_value : un tri unique par
+        (Marque, Modele, Année) remplace le filtrage complet du DataFrame par véhicule.
+        execution='processus' répartit les groupes (Marque, Modele) sur n_workers processus.
+        """
+        codes = _codes_groupes(self.df)
+        annees = self.df['Année'].to_numpy(dtype=float)
+        codes[np.isnan(annees)] = -1
+        annees = np.nan_to_num(annees, nan=np.nanmin(annees, initial=0))
+        prix = self.df['Prix'].to_numpy(dtype=float)
+        km = self.df['Kilométrage'].to_numpy(dtype=float)
+
+        ordre = np.lexsort((annees, codes))
+        colonnes_triees = (codes[ordre], annees[ordre], prix[ordre], km[ordre])
+        if execution == 'serie':
+            scores_tries = _scores_fenetre_triee(*colonnes_triees)
+        elif execution == 'processus':
+            scores_tries = _scores_multi_processus(*colonnes_triees, n_workers=n_workers,
+                                                   progression=self.metriques.progression)
+        else:
+            raise ValueError(f"Mode d'exécution inconnu : {execution}")
+
+        scores = np.empty(len(ordre))
+        scores[ordre] = scores_tries
+        return pd.Series(scores, index=self.df.index, name='Score_value')
+
+    def _bons_rapports(self, scores):
+        """Résultats "Bon rapport qualité-prix" (ResultatsAffaires) à partir des scores"""
+        valeurs = scores.to_numpy()
+        positions = np.flatnonzero(valeurs > SEUIL_SCORE_VALUE)
+        return ResultatsAffaires(self.df, positions, TYPES_AFFAIRES.index('Bon rapport qualité-prix'),
+                                 {'Score_value': valeurs[positions]})
+
     def calculer_scores_par_batch(self, vehicules_batch):
-        """Calcule les scores pour un batch de véhicules"""
-        resultats = []
-        for _, vehicule in vehicules_batch.iterrows():
-            score = self.calculer_score_value(vehicule)
-            if score > 0.25:  # Seuil ajusté à 0.25
-                resultats.append({
-                    'ID': vehicule['ID'],
-                    'Marque': vehicule['Marque'],
-                    'Modele': vehicule['Modele'],
-                    'Prix': vehicule['Prix'],
-                    'Score_value': score,
-                    'Année': vehicule['Année'],
-                    'Kilométrage': vehicule['Kilométrage'],
-                    'URL': vehicule['URL'],
-                    'Type': 'Bon rapport qualité-prix'
-                })
-        return resultats
+        """Calcule les scores pour un batch de véhicules
+
+        Les lignes du batch (contiguës ou non) sont retrouvées dans self.df par leur index.
+        """
+        positions = self.df.index.get_indexer(vehicules_batch.index)
+        if (positions < 0).any():
+            raise ValueError("Le batch contient des lignes absentes de self.df")
+        scores = np.array([self.calculer_score_value(vehicule) for _, vehicule in vehicules_batch.iterrows()],
+                          dtype=float)
+        retenus = np.flatnonzero(scores > SEUIL_SCORE_VALUE)
+        return ResultatsAffaires(self.df, positions[retenus], TYPES_AFFAIRES.index('Bon rapport qualité-prix'),
+                                 {'Score_value': scores[retenus]})
+
+    def modele_prix_ajuste(self, reajuster=False):
+        """Modèle de prix par (Marque, Modele), rechargé depuis fichier_modele_prix s'il existe
 
-    def detecter_anomalies_prix(self):
-        """Détecte les véhicules dont le prix est anormalement bas"""
+        reajuster=True ajuste de nouveaux coefficients sur self.df et remplace le fichier.
+        """
+        if reajuster:
+            self.modele_prix = None
+        if self.modele_prix is None:
+            if self.fichier_modele_prix and os.path.exists(self.fichier_modele_prix) and not reajuster:
+                self.modele_prix = ModelePrix.charger(self.fichier_modele_prix)
+                print(f"Coefficients de prix réutilisés depuis {self.fichier_modele_prix} "
+                      f"(ajustés le {self.modele_prix.date_ajustement})")
+            else:
+                with self.metriques.etape('regression'):
+                    self.modele_prix = ModelePrix.ajuster(self.df)
+                    modeles = self.modele_prix.coefficients.query("niveau == 'modele'")
+                    for source, nombre in modeles['source'].value_counts().items():
+                        self.metriques.compter(f'modeles_pentes_{source}', nombre)
+                if self.fichier_modele_prix:
+                    self.modele_prix.sauvegarder(self.fichier_modele_prix)
+        return self.modele_prix
+
+    @mesurer_etape('anomalies')
+    def detecter_anomalies_prix(self, methode='regression'):
+        """Détecte les véhicules dont le prix est anormalement bas
+
+        Toutes les statistiques de groupe (Marque, Modele) sont calculées par transform
+        sur le DataFrame entier ; retourne un ResultatsAffaires avec un résultat par anomalie.
+        methode='regression' prédit le prix avec les régressions par modèle (modele_prix_ajuste) ;
+        methode='fixe' conserve les anciens coefficients communs à tous les modèles.
+        """
         print("\nAnalyse des anomalies de prix...")
-        resultats = []
-        groupes = list(self.df.groupby(['Marque', 'Modele']))
-        seuil_ecart_type = 10_000  # Seuil pour exclure les groupes très variables
-
-        with tqdm(total=len(groupes), desc="Analyse des groupes") as pbar:
-            for (marque, modele), groupe in groupes:
-                taille_groupe = len(groupe)
-                if taille_groupe < 3 or groupe['Prix'].std() > seuil_ecart_type:
-                    pbar.update(1)
-                    continue
-
-                # Calculs pour ce groupe
-                prix_moyen = groupe['Prix'].mean()
-                km_impact = -0.1 * (groupe['Kilométrage'] - groupe['Kilométrage'].mean()) / 10000
-                annee_impact = 0.05 * (groupe['Année'] - groupe['Année'].mean())
-                prix_predit = prix_moyen * (1 + km_impact + annee_impact)
-
-                # Identifier les bonnes affaires
-                for idx, row in groupe.iterrows():
-                    prix_predit_vehicule = prix_predit.loc[idx]
-                    if row['Prix'] < 0.75 * prix_predit_vehicule:  # Seuil ajusté à 75%
-                        resultats.append({
-                            'ID': row['ID'],
-                            'Marque': row['Marque'],
-                            'Modele': row['Modele'],
-                            'Prix': row['Prix'],
-                            'Prix_predit': prix_predit_vehicule,
-                            'Économie': prix_predit_vehicule - row['Prix'],
-                            'Pourcentage_économie': ((prix_predit_vehicule - row['Prix']) / prix_predit_vehicule) * 100,
-                            'Année': row['Année'],
-                            'Kilométrage': row['Kilométrage'],
-                            'URL': row['URL'],
-                            'Nombre_comparables': taille_groupe  # Taille du groupe
-                        })
-                pbar.update(1)
+        groupes = self.df.groupby(['Marque', 'Modele'], observed=True)
+
+        taille_groupe = groupes['Prix'].transform('size')
+        prix_moyen = groupes['Prix'].transform('mean')
+        ecart_type = groupes['Prix'].transform('std')
+        if methode == 'regression':
+            prix_predit = pd.Series(self.modele_prix_ajuste().predire(self.df), index=self.df.index)
+        elif methode == 'fixe':
+            km_impact = -0.1 * (self.df['Kilométrage'] - groupes['Kilométrage'].transform('mean')) / 10000
+            annee_impact = 0.05 * (self.df['Année'] - groupes['Année'].transform('mean'))
+            prix_predit = prix_moyen * (1 + km_impact + annee_impact)
+        else:
+            raise ValueError(f"Méthode de prédiction inconnue : {methode}")
+
+        groupe_retenu = (taille_groupe >= TAILLE_MIN_GROUPE_ANOMALIE) & ~(ecart_type > ECART_TYPE_MAX_ANOMALIE)
+        masque = groupe_retenu & (self.df['Prix'] < RATIO_PRIX_ANOMALIE * prix_predit)
+        self.metriques.compter('groupes_ignores', groupes.ngroups - groupes.ngroup()[groupe_retenu].nunique())
+
+        # Ordre des groupes triés, puis ordre d'origine dans chaque groupe
+        positions = np.flatnonzero(masque.to_numpy())
+        rang_groupe = groupes.ngroup().to_numpy()[positions]
+        positions = positions[np.argsort(rang_groupe, kind='stable')]
+
+        prix = self.df['Prix'].to_numpy(dtype=float)[positions]
+        prix_predit = prix_predit.to_numpy(dtype=float)[positions]
+        resultats = ResultatsAffaires(self.df, positions, TYPES_AFFAIRES.index('Prix anormalement bas'), {
+            'Prix_predit': prix_predit,
+            'Économie': prix_predit - prix,
+            'Pourcentage_économie': ((prix_predit - prix) / prix_predit) * 100,
+            'Nombre_comparables': taille_groupe.to_numpy()[positions],  # Taille du groupe
+        })
 
+        self.metriques.compter('anomalies', len(resultats))
         print(f"Nombre d'anomalies trouvées : {len(resultats)}")
         return resultats
 
-    def trouver_bonnes_affaires(self, criteres_personnalises=None):
-        """Trouve les bonnes affaires avec traitement parallèle"""
+    @mesurer_etape('bonnes_affaires')
+    def trouver_bonnes_affaires(self, criteres_personnalises=None, moteur='vectorise',
+                                execution='serie', n_workers=None):
+        """Trouve les bonnes affaires
+
+        moteur='vectorise' calcule tous les scores en une passe (calculer_scores_value),
+        en série ou en pool de processus selon execution/n_workers ;
+        moteur='ligne' conserve l'ancien calcul véhicule par véhicule pour comparaison.
+        criteres_personnalises filtre les résultats (voir ResultatsAffaires.filtrer).
+        Retourne un ResultatsAffaires trié par économie ou score décroissant.
+        """
         print("\nRecherche des bonnes affaires...")
-        bonnes_affaires = []
+        parties = []
         
         # Analyse des prix anormalement bas
         anomalies = self.detecter_anomalies_prix()
         
-        # Calcul parallèle des scores value
         print("\nCalcul des scores qualité-prix...")
-        n_cpu = multiprocessing.cpu_count()
-        batch_size = max(1000, len(self.df) // (n_cpu * 4))
-        batches = [self.df[i:i + batch_size] for i in range(0, len(self.df), batch_size)]
-        
-        with ThreadPoolExecutor(max_workers=n_cpu) as executor:
-            futures = []
-            for batch in batches:
-                futures.append(executor.submit(self.calculer_scores_par_batch, batch))
+        if moteur == 'vectorise':
+            scores = self.calculer_scores_value(execution=execution, n_workers=n_workers)
+            parties.append(self._bons_rapports(scores))
+        elif moteur == 'ligne':
+            n_cpu = multiprocessing.cpu_count()
+            batch_size = max(1000, len(self.df) // (n_cpu * 4))
+            debuts = range(0, len(self.df), batch_size)
             
-            with tqdm(total=len(futures), desc="Traitement des batches") as pbar:
-                for future in futures:
-                    bonnes_affaires.extend(future.result())
-                    pbar.update(1)
+            with ThreadPoolExecutor(max_workers=n_cpu) as executor:
+                futures = []
+                for debut in debuts:
+                    futures.append(executor.submit(self.calculer_scores_par_batch,
+                                                   self.df[debut:debut + batch_size]))
+                
+                for future in self.metriques.barre(futures, desc="Traitement des batches"):
+                    parties.append(future.result())
+        else:
+            raise ValueError(f"Moteur de score inconnu : {moteur}")
         
         # Ajouter les anomalies de prix
-        bonnes_affaires.extend([{**anomalie, 'Type': 'Prix anormalement bas'} for anomalie in anomalies])
+        parties.append(anomalies)
+        bonnes_affaires = ResultatsAffaires.concatener(parties)
         
         # Appliquer les critères personnalisés
         if criteres_personnalises:
             print("\nApplication des critères personnalisés...")
-            bonnes_affaires = [ba for ba in tqdm(bonnes_affaires) if self._verifier_criteres(ba, criteres_personnalises)]
+            bonnes_affaires = bonnes_affaires.filtrer(criteres_personnalises)
         
         # Tri final
         print("\nTri des résultats...")
-        bonnes_affaires.sort(key=lambda x: x.get('Pourcentage_économie', x.get('Score_value', 0)), reverse=True)
-        
-        return bonnes_affaires
+        return bonnes_affaires.trier()
+
+    @mesurer_etape('export')
+    def exporter_resultats(self, bonnes_affaires, tendances, nom_fichier='resultats_analyse.xlsx',
+                           format_export=None):
+            """Exporte les résultats (Excel en flux, Parquet ou CSV, voir export_resultats)
 
-    def exporter_resultats(self, bonnes_affaires, tendances, nom_fichier='resultats_analyse.xlsx'):
-            """Exporte les résultats dans un fichier Excel formaté"""
+            bonnes_affaires (ResultatsAffaires) n'est matérialisé qu'ici, colonnes exportées seulement.
+            Le format est déduit de l'extension de nom_fichier sauf si format_export est
+            fourni ; en Parquet et CSV chaque feuille devient un fichier <nom>_<feuille>.
+            Retourne la liste des fichiers écrits.
+            """
             print(f"\nExportation des résultats vers {nom_fichier}...")
-            
-            # Créer un writer Excel avec openpyxl
-            with pd.ExcelWriter(nom_fichier, engine='openpyxl') as writer:
-                # 1. Export des bonnes affaires
-                df_bonnes_affaires = pd.DataFrame(bonnes_affaires)
-                if not df_bonnes_affaires.empty:
-                    # Réorganiser les colonnes
-                    colonnes = ['Type', 'Marque', 'Modele', 'Prix', 'Prix_predit', 'Économie', 
-                            'Pourcentage_économie', 'Score_value', 'Année', 'Kilométrage', 'URL']
-                    df_bonnes_affaires = df_bonnes_affaires.reindex(columns=[col for col in colonnes if col in df_bonnes_affaires.columns])
-                    
-                    # Formater les nombres
-                    for col in ['Prix', 'Prix_predit', 'Économie']:
-                        if col in df_bonnes_affaires.columns:
-                            df_bonnes_affaires[col] = df_bonnes_affaires[col].round(2)
-                    
-                    df_bonnes_affaires.to_excel(writer, sheet_name='Bonnes Affaires', index=False)
-                    
-                    # Formater la feuille
-                    sheet = writer.sheets['Bonnes Affaires']
-                    for idx, col in enumerate(df_bonnes_affaires.columns, 1):
-                        cell = sheet.cell(row=1, column=idx)
-                        cell.font = Font(bold=True)
-                        cell.fill = PatternFill(start_color='CCCCCC', end_color='CCCCCC', fill_type='solid')
-                        sheet.column_dimensions[get_column_letter(idx)].width = 15
-                    
-                # 2. Export des tendances du marché
-                df_tendances = pd.DataFrame.from_dict(tendances, orient='index')
-                df_tendances.to_excel(writer, sheet_name='Tendances Marché')
-                
-                # 3. Export des statistiques globales
-                stats_globales = {
-                    'Métrique': [
-                        'Nombre total de véhicules',
-                        'Nombre de bonnes affaires',
-                        'Prix moyen',
-                        'Prix médian',
-                        'Kilométrage moyen',
-                        'Année moyenne'
-                    ],
-                    'Valeur': [
-                        len(self.df),
-                        len(bonnes_affaires),
-                        self.df['Prix'].mean(),
-                        self.df['Prix'].median(),
-                        self.df['Kilométrage'].mean(),
-                        self.df['Année'].mean()
-                    ]
-                }
-                df_stats = pd.DataFrame(stats_globales)
-                df_stats.to_excel(writer, sheet_name='Statistiques Globales', index=False)
+            feuilles = {}
+
+            # 1. Bonnes affaires
+            if len(bonnes_affaires):
+                # Réorganiser les colonnes
+                colonnes = ['Type', 'Marque', 'Modele', 'Prix', 'Prix_predit', 'Économie', 
+                        'Pourcentage_économie', 'Score_value', 'Année', 'Kilométrage', 'URL']
+                df_bonnes_affaires = bonnes_affaires.vers_dataframe(colonnes)
                 
-                # 4. Export des top modèles
-                top_modeles = (self.df.groupby(['Marque', 'Modele'])
-                            .agg({
-                                'Prix': ['count', 'mean', 'min', 'max'],
-                                'Kilométrage': 'mean',
-                                'Année': 'mean'
-                            })
-                            .reset_index())
-                top_modeles.columns = ['Marque', 'Modele', 'Nombre_annonces', 'Prix_moyen', 
-                                    'Prix_min', 'Prix_max', 'Km_moyen', 'Année_moyenne']
-                top_modeles = top_modeles.sort_values('Nombre_annonces', ascending=False)
-                top_modeles.to_excel(writer, sheet_name='Top Modèles', index=False)
+                # Formater les nombres
+                for col in ['Prix', 'Prix_predit', 'Économie']:
+                    if col in df_bonnes_affaires.columns:
+                        df_bonnes_affaires[col] = df_bonnes_affaires[col].round(2)
+                feuilles['Bonnes Affaires'] = df_bonnes_affaires
                 
-                # 5. Export des anomalies de prix
-                anomalies = [item for item in bonnes_affaires if item['Type'] == 'Prix anormalement bas']
-                if anomalies:
-                    df_anomalies = pd.DataFrame(anomalies)
-                    df_anomalies.to_excel(writer, sheet_name='Anomalies Prix', index=False)
+            # 2. Tendances du marché
+            feuilles['Tendances Marché'] = (pd.DataFrame.from_dict(tendances, orient='index')
+                                            .rename_axis('Modèle').reset_index())
+            
+            # 3. Statistiques globales
+            feuilles['Statistiques Globales'] = pd.DataFrame({
+                'Métrique': [
+                    'Nombre total de véhicules',
+                    'Nombre de bonnes affaires',
+                    'Prix moyen',
+                    'Prix médian',
+                    'Kilométrage moyen',
+                    'Année moyenne'
+                ],
+                'Valeur': [
+                    len(self.df),
+                    len(bonnes_affaires),
+                    self.df['Prix'].mean(),
+                    self.df['Prix'].median(),
+                    self.df['Kilométrage'].mean(),
+                    self.df['Année'].mean()
+                ]
+            })
+            
+            # 4. Top modèles, depuis les agrégats déjà calculés pour les tendances
+            top_modeles = (self.agregats_modeles()
+                           [['nombre_prix', 'prix_moyen', 'prix_min', 'prix_max', 'km_moyen', 'annee_moyenne']]
+                           .reset_index())
+            top_modeles.columns = ['Marque', 'Modele', 'Nombre_annonces', 'Prix_moyen', 
+                                'Prix_min', 'Prix_max', 'Km_moyen', 'Année_moyenne']
+            feuilles['Top Modèles'] = top_modeles.sort_values('Nombre_annonces', ascending=False)
+            
+            # 5. Anomalies de prix
+            anomalies = bonnes_affaires.selon_type('Prix anormalement bas')
+            if len(anomalies):
+                colonnes = ['ID', 'Marque', 'Modele', 'Prix', 'Prix_predit', 'Économie', 'Pourcentage_économie',
+                            'Année', 'Kilométrage', 'URL', 'Nombre_comparables', 'Type']
+                feuilles['Anomalies Prix'] = anomalies.vers_dataframe(colonnes)
+
+            fichiers = exporter(feuilles, nom_fichier, format_export)
+            self.metriques.compter('lignes_exportees', sum(len(df) for df in feuilles.values()))
 
-            print(f"Résultats exportés avec succès dans {nom_fichier}")
-            return nom_fichier
+            print(f"Résultats exportés avec succès dans {', '.join(fichiers)}")
+            return fichiers
 
-    def generer_rapport_complet(self):
-        """Génère et exporte un rapport complet d'analyse"""
+    def generer_rapport_complet(self, dossier_etat=None, format_export='xlsx', reajuster_modele=False):
+        """Génère et exporte un rapport complet d'analyse
+
+        Avec dossier_etat, l'analyse est incrémentale : seuls les groupes (Marque, Modele)
+        modifiés depuis l'exécution précédente sont recalculés (voir analyse_incrementale).
+        Le modèle de prix (fichier_modele_prix, ou celui de l'état) n'est réajusté que si reajuster_modele.
+        format_export choisit le format des résultats : 'xlsx', 'parquet' ou 'csv'.
+        Retourne la liste des fichiers de résultats écrits.
+        """
         print("\nGénération du rapport complet...")
         
-        # Analyser les tendances
-        print("Analyse des tendances du marché...")
-        tendances = self.analyser_tendances_marche()
-        
-        # Trouver les bonnes affaires
-        print("Recherche des bonnes affaires...")
-        bonnes_affaires = self.trouver_bonnes_affaires()
+        if dossier_etat:
+            from analyse_incrementale import AnalyseIncrementale
+
+            print("Mise à jour de l'état incrémental...")
+            with self.metriques.etape('incremental'):
+                etat = AnalyseIncrementale(dossier_etat)
+                resume = etat.mettre_a_jour(self.df, metriques=self.metriques, reajuster_modele=reajuster_modele)
+                for compteur, valeur in resume.items():
+                    self.metriques.compter(compteur, valeur)
+                tendances = etat.tendances()
+                bonnes_affaires = etat.bonnes_affaires()
+                etat.sauvegarder()
+        else:
+            if reajuster_modele:
+                self.modele_prix_ajuste(reajuster=True)
+
+            # Analyser les tendances
+            print("Analyse des tendances du marché...")
+            tendances = self.analyser_tendances_marche()
+            
+            # Trouver les bonnes affaires
+            print("Recherche des bonnes affaires...")
+            bonnes_affaires = self.trouver_bonnes_affaires()
         
         # Exporter les résultats
-        nom_fichier = f'analyse_voitures_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-        fichier_resultat = self.exporter_resultats(bonnes_affaires, tendances, nom_fichier)
+        nom_fichier = f'analyse_voitures_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{format_export}'
+        fichiers_resultat = self.exporter_resultats(bonnes_affaires, tendances, nom_fichier, format_export)
         
-        print(f"\nAnalyse terminée! Les résultats ont été enregistrés dans {fichier_resultat}")
+        print(f"\nAnalyse terminée! Les résultats ont été enregistrés dans {', '.join(fichiers_resultat)}")
+        fichier_metriques = self.metriques.ecrire(f"{os.path.splitext(nom_fichier)[0]}_metriques.json")
+        print(f"Métriques d'exécution enregistrées dans {fichier_metriques}")
         
         # Afficher un résumé
         print(f"\nRésumé de l'analyse:")
@@ -280,15 +724,17 @@ class AnalyseurVoitures:
         print(f"- Nombre de bonnes affaires trouvées: {len(bonnes_affaires)}")
         print(f"- Nombre de modèles différents: {len(tendances)}")
         
-        return fichier_resultat
+        return fichiers_resultat
 
 
 # Exemple d'utilisation
 if __name__ == "__main__":
     try:
         print("Démarrage de l'analyse...")
-        analyseur = AnalyseurVoitures('resume_2025-01-13__BretagneV2.csv')
-        fichier_resultat = analyseur.generer_rapport_complet()
-        print(f"\nVous pouvez maintenant ouvrir {fichier_resultat} pour voir les résultats détaillés.")
+        analyseur = AnalyseurVoitures('resume_2025-01-13__BretagneV2.csv', dossier_cache='.cache_analyse',
+                                      fichier_modele_prix='modele_prix.json')
+        analyseur.regrouper_reposts()
+        fichiers_resultat = analyseur.generer_rapport_complet()
+        print(f"\nVous pouvez maintenant ouvrir {', '.join(fichiers_resultat)} pour voir les résultats détaillés.")
     except Exception as e:
         print(f"Une erreur est survenue: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,308 @@
+import json
+import math
+import os
+import shutil
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from cache_colonnes import ecrire_cache, lire_cache
+from regression_prix import ModelePrix
+from resultats_affaires import ResultatsAffaires
+
+COLONNES_EMPREINTE = ['Marque', 'Modele', 'Prix', 'Année', 'Kilométrage', 'URL']
+PRECISION_CROQUIS = 0.01  # Erreur relative maximale de la médiane estimée
+FICHIER_MODELE = 'modele_prix.json'  # Coefficients de régression propres à l'état
+
+
+class CroquisQuantiles:
+    """Croquis de quantiles à erreur relative bornée (type DDSketch)
+
+    Chaque valeur positive tombe dans un seau logarithmique : le croquis se fusionne
+    par addition des compteurs et supporte le retrait d'une valeur déjà ajoutée.
+    """
+
+    def __init__(self, precision=PRECISION_CROQUIS, compteurs=None):
+        self.precision = precision
+        self.gamma = (1 + precision) / (1 - precision)
+        self.compteurs = dict(compteurs or {})
+
+    def indices(self, valeurs):
+        """Indice de seau de chaque valeur"""
+        return np.ceil(np.log(np.asarray(valeurs, dtype=float)) / math.log(self.gamma)).astype(np.int64)
+
+    def mettre_a_jour(self, indices, poids):
+        """Ajoute (poids > 0) ou retire (poids < 0) des comptes par seau"""
+        for indice, compte in zip(indices, poids):
+            total = self.compteurs.get(indice, 0) + compte
+            if total:
+                self.compteurs[indice] = total
+            else:
+                self.compteurs.pop(indice, None)
+
+    def fusionner(self, autre):
+        """Ajoute les comptes d'un autre croquis de même précision"""
+        self.mettre_a_jour(autre.compteurs.keys(), autre.compteurs.values())
+
+    def valeur(self, indice):
+        """Valeur représentative d'un seau (erreur relative au plus precision)"""
+        return 2 * self.gamma ** indice / (self.gamma + 1)
+
+    def quantile(self, q):
+        """Estime le quantile q (0 <= q <= 1), NaN si le croquis est vide
+
+        Comme pandas (interpolation linéaire), le rang q * (n - 1) tombe entre deux
+        valeurs triées : les seaux des rangs inférieur et supérieur sont interpolés.
+        """
+        total = sum(self.compteurs.values())
+        if total <= 0:
+            return float('nan')
+        rang = q * (total - 1)
+        rang_bas, rang_haut = math.floor(rang), math.ceil(rang)
+        bas = None
+        cumul = 0
+        for indice in sorted(self.compteurs):
+            cumul += self.compteurs[indice]
+            if bas is None and cumul > rang_bas:
+                bas = self.valeur(indice)
+            if cumul > rang_haut:
+                haut = self.valeur(indice)
+                break
+        return bas + (rang - rang_bas) * (haut - bas)
+
+
+def _ecrire_table(df, chemin):
+    """Remplace une table de l'état : écriture à côté puis échange des dossiers"""
+    nouveau, ancien = chemin + '.nouveau', chemin + '.ancien'
+    shutil.rmtree(nouveau, ignore_errors=True)
+    shutil.rmtree(ancien, ignore_errors=True)
+    ecrire_cache(df, nouveau)
+    if os.path.isdir(chemin):
+        os.replace(chemin, ancien)
+    os.replace(nouveau, chemin)
+    shutil.rmtree(ancien, ignore_errors=True)
+
+
+def _lire_table(chemin):
+    """Relit une table de l'état en mémoire (copie : le fichier peut être remplacé ensuite)"""
+    if not os.path.isdir(chemin):
+        return None
+    return lire_cache(chemin).copy()
+
+
+def _masque_groupes(df, groupes):
+    """Lignes de df appartenant à l'un des groupes (Marque, Modele) donnés"""
+    if df is None or df.empty or not groupes:
+        return np.zeros(0 if df is None else len(df), dtype=bool)
+    cles = pd.MultiIndex.from_arrays([df['Marque'].astype(str), df['Modele'].astype(str)])
+    return cles.isin(list(groupes))
+
+
+class AnalyseIncrementale:
+    """État persistant d'une analyse quotidienne, mis à jour par différence avec la veille
+
+    Seuls les groupes (Marque, Modele) touchés par une annonce nouvelle, modifiée ou
+    retirée sont recalculés, avec le modèle de prix propre à l'état (FICHIER_MODELE).
+    """
+
+    def __init__(self, dossier_etat):
+        self.dossier_etat = dossier_etat
+        self.annonces = _lire_table(os.path.join(dossier_etat, 'annonces'))
+        self.bons_rapports = _lire_table(os.path.join(dossier_etat, 'bons_rapports'))
+        self.anomalies = _lire_table(os.path.join(dossier_etat, 'anomalies'))
+        self.agregats = {}
+        chemin_agregats = os.path.join(dossier_etat, 'agregats.json')
+        if os.path.isfile(chemin_agregats):
+            with open(chemin_agregats, encoding='utf-8') as f:
+                for entree in json.load(f):
+                    entree['croquis'] = {int(k): v for k, v in entree['croquis'].items()}
+                    self.agregats[(entree.pop('marque'), entree.pop('modele'))] = entree
+        chemin_modele = os.path.join(dossier_etat, FICHIER_MODELE)
+        self.modele_prix = ModelePrix.charger(chemin_modele) if os.path.isfile(chemin_modele) else None
+
+    @staticmethod
+    def _table_annonces(df):
+        """Extrait les colonnes suivies par l'état et calcule l'empreinte de chaque annonce"""
+        table = pd.DataFrame({
+            'ID': df['ID'].to_numpy(),
+            'Marque': df['Marque'].astype(object).where(df['Marque'].notna(), None),
+            'Modele': df['Modele'].astype(object).where(df['Modele'].notna(), None),
+            'Prix': df['Prix'].astype(float),
+            'Année': df['Année'].astype(float),
+            'Kilométrage': df['Kilométrage'].astype(float),
+        }).reset_index(drop=True)
+        valides = table['Marque'].notna() & table['Modele'].notna()
+        table.loc[valides, 'Marque'] = table.loc[valides, 'Marque'].astype(str)
+        table.loc[valides, 'Modele'] = table.loc[valides, 'Modele'].astype(str)
+        empreinte = df[[c for c in COLONNES_EMPREINTE if c in df.columns]].copy()
+        for colonne in empreinte.columns:
+            if colonne in ('Prix', 'Année', 'Kilométrage'):
+                empreinte[colonne] = empreinte[colonne].astype(float)
+            else:
+                empreinte[colonne] = empreinte[colonne].astype(object)
+        table['empreinte'] = pd.util.hash_pandas_object(empreinte, index=False).to_numpy()
+        return table
+
+    def _appliquer(self, lignes, signe):
+        """Ajoute (signe=1) ou retire (signe=-1) des annonces des agrégats courants"""
+        lignes = lignes[lignes['Marque'].notna() & lignes['Modele'].notna()]
+        if lignes.empty:
+            return
+        lignes = lignes.assign(
+            carre_prix=lignes['Prix'] ** 2,
+            seau=CroquisQuantiles().indices(lignes['Prix']),
+        )
+        sommes = lignes.groupby(['Marque', 'Modele']).agg(
+            nombre=('Prix', 'size'),
+            somme_prix=('Prix', 'sum'),
+            somme_carres_prix=('carre_prix', 'sum'),
+            somme_km=('Kilométrage', 'sum'),
+            somme_annees=('Année', 'sum'),
+            prix_min=('Prix', 'min'),
+            prix_max=('Prix', 'max'),
+        )
+        seaux = lignes.groupby(['Marque', 'Modele', 'seau']).size()
+
+        for groupe, ligne in sommes.iterrows():
+            agregat = self.agregats.setdefault(groupe, {
+                'nombre': 0, 'somme_prix': 0.0, 'somme_carres_prix': 0.0, 'somme_km': 0.0,
+                'somme_annees': 0.0, 'prix_min': math.inf, 'prix_max': -math.inf, 'croquis': {},
+            })
+            agregat['nombre'] += signe * int(ligne['nombre'])
+            for champ in ('somme_prix', 'somme_carres_prix', 'somme_km', 'somme_annees'):
+                agregat[champ] += signe * float(ligne[champ])
+            if signe > 0:
+                agregat['prix_min'] = min(agregat['prix_min'], float(ligne['prix_min']))
+                agregat['prix_max'] = max(agregat['prix_max'], float(ligne['prix_max']))
+            elif ligne['prix_min'] <= agregat['prix_min'] or ligne['prix_max'] >= agregat['prix_max']:
+                # Un extrême a été retiré : min/max ne sont pas décrémentables
+                agregat['a_recalculer'] = True
+
+        for (marque, modele, seau), compte in seaux.items():
+            croquis = CroquisQuantiles(compteurs=self.agregats[(marque, modele)]['croquis'])
+            croquis.mettre_a_jour([int(seau)], [signe * int(compte)])
+            self.agregats[(marque, modele)]['croquis'] = croquis.compteurs
+
+    def mettre_a_jour(self, df, metriques=None, reajuster_modele=False):
+        """Intègre l'extraction du jour et recalcule uniquement les groupes modifiés
+
+        reajuster_modele=True réajuste le modèle de prix de l'état sur df et recalcule
+        alors les résultats de tous les groupes (comme le premier passage).
+        Retourne le nombre d'annonces nouvelles, modifiées et retirées ainsi que
+        celui des groupes (Marque, Modele) recalculés.
+        """
+        from algo_bonne_affaire_v2 import AnalyseurVoitures
+
+        df = df.drop_duplicates('ID', keep='last')
+        jour = self._table_annonces(df)
+        veille = self.annonces if self.annonces is not None else jour.iloc[:0]
+
+        fusion = veille[['ID', 'empreinte']].merge(
+            jour[['ID', 'empreinte']], on='ID', how='outer', suffixes=('_veille', ''), indicator=True
+        )
+        retirees = fusion.loc[fusion['_merge'] == 'left_only', 'ID']
+        nouvelles = fusion.loc[fusion['_merge'] == 'right_only', 'ID']
+        modifiees = fusion.loc[
+            (fusion['_merge'] == 'both') & (fusion['empreinte_veille'] != fusion['empreinte']), 'ID'
+        ]
+
+        retraits = veille[veille['ID'].isin(retirees) | veille['ID'].isin(modifiees)]
+        ajouts = jour[jour['ID'].isin(nouvelles) | jour['ID'].isin(modifiees)]
+        self._appliquer(retraits, -1)
+        self._appliquer(ajouts, 1)
+
+        groupes_modifies = set()
+        for lignes in (retraits, ajouts):
+            lignes = lignes[lignes['Marque'].notna() & lignes['Modele'].notna()]
+            groupes_modifies.update(zip(lignes['Marque'], lignes['Modele']))
+
+        # Groupes vidés, extrêmes à recalculer sur les seules annonces du groupe
+        masque_jour = _masque_groupes(jour, groupes_modifies)
+        extremes = jour[masque_jour].groupby(['Marque', 'Modele'])['Prix'].agg(['min', 'max'])
+        for groupe in groupes_modifies:
+            agregat = self.agregats.get(groupe)
+            if agregat is None:
+                continue
+            if agregat['nombre'] <= 0:
+                del self.agregats[groupe]
+            elif agregat.pop('a_recalculer', False):
+                agregat['prix_min'], agregat['prix_max'] = extremes.loc[groupe].tolist()
+
+        # Nouveaux résultats des groupes modifiés, ceux des autres groupes sont conservés.
+        # Un nouveau modèle de prix change les anomalies de tous les groupes : tout est recalculé
+        if self.modele_prix is None or reajuster_modele:
+            self.modele_prix = ModelePrix.ajuster(df)
+            self.anomalies = self.bons_rapports = None
+            valides = jour[jour['Marque'].notna() & jour['Modele'].notna()]
+            groupes_recalcules = set(zip(valides['Marque'], valides['Modele']))
+            masque_jour = _masque_groupes(jour, groupes_recalcules)
+        else:
+            groupes_recalcules = groupes_modifies
+        sous_analyseur = AnalyseurVoitures.depuis_dataframe(df[masque_jour], metriques, self.modele_prix)
+        anomalies = sous_analyseur.detecter_anomalies_prix().vers_dataframe().drop(columns='Type')
+        bons_rapports = sous_analyseur._bons_rapports(sous_analyseur.calculer_scores_value()).vers_dataframe()
+        if self.anomalies is not None:
+            anomalies = pd.concat([self.anomalies[~_masque_groupes(self.anomalies, groupes_modifies)], anomalies])
+        if self.bons_rapports is not None:
+            bons_rapports = pd.concat([self.bons_rapports[~_masque_groupes(self.bons_rapports, groupes_modifies)], bons_rapports])
+        self.anomalies = anomalies.reset_index(drop=True)
+        self.bons_rapports = bons_rapports.reset_index(drop=True)
+        self.annonces = jour
+
+        resume = {
+            'nouvelles': len(nouvelles),
+            'modifiees': len(modifiees),
+            'retirees': len(retirees),
+            'groupes_recalcules': len(groupes_recalcules),
+        }
+        print(f"Mise à jour incrémentale : {resume}")
+        return resume
+
+    def tendances(self):
+        """Tendances par modèle au format de analyser_tendances_marche (médiane estimée)"""
+        tendances = {}
+        annee_courante = datetime.now().year
+        for (marque, modele), agregat in sorted(self.agregats.items()):
+            n = agregat['nombre']
+            if n < 3:
+                continue
+            prix_moyen = agregat['somme_prix'] / n
+            variance = max(agregat['somme_carres_prix'] - n * prix_moyen ** 2, 0) / (n - 1)
+            tendances[f"{marque} {modele}"] = {
+                'prix_moyen': prix_moyen,
+                'prix_median': CroquisQuantiles(compteurs=agregat['croquis']).quantile(0.5),
+                'ecart_type_prix': math.sqrt(variance),
+                'km_moyen': agregat['somme_km'] / n,
+                'age_moyen': annee_courante - agregat['somme_annees'] / n,
+                'nombre_annonces': n,
+                'prix_min': agregat['prix_min'],
+                'prix_max': agregat['prix_max'],
+            }
+        return tendances
+
+    def bonnes_affaires(self):
+        """Bonnes affaires de l'état courant (ResultatsAffaires), triées comme trouver_bonnes_affaires"""
+        return ResultatsAffaires.depuis_tables({
+            'Bon rapport qualité-prix': self.bons_rapports,
+            'Prix anormalement bas': self.anomalies,
+        }).trier()
+
+    def sauvegarder(self):
+        """Écrit l'état sur disque (tables colonnaires, agrégats et modèle de prix JSON)"""
+        os.makedirs(self.dossier_etat, exist_ok=True)
+        if self.modele_prix is not None:
+            self.modele_prix.sauvegarder(os.path.join(self.dossier_etat, FICHIER_MODELE))
+        for nom in ('annonces', 'bons_rapports', 'anomalies'):
+            table = getattr(self, nom)
+            if table is not None:
+                _ecrire_table(table, os.path.join(self.dossier_etat, nom))
+
+        entrees = [
+            {'marque': marque, 'modele': modele, **agregat}
+            for (marque, modele), agregat in self.agregats.items()
+        ]
+        chemin = os.path.join(self.dossier_etat, 'agregats.json')
+        with open(chemin + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(entrees, f, ensure_ascii=False)
+        os.replace(chemin + '.tmp', chemin)
@@ -0,0 +1,192 @@
+import argparse
+import glob
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from algo_bonne_affaire_v2 import (VERSION_CACHE_CHUNKS, VERSION_CACHE_CHUNKS_TEXTE, AnalyseurVoitures,
+                                   _concatener_categoriels, charger_donnees_par_chunks)
+from cache_colonnes import DOSSIER_CACHE, TAILLE_MAX_CACHE, evincer, lire_cache, remplir_cache
+from instrumentation import Metriques
+
+MOTIF_DATE = re.compile(r'(\d{4}-\d{2}-\d{2})')  # resume_<date>_<mots-clés>_<lieu>V2.csv
+
+
+def lister_fichiers(motifs=(), manifeste=None):
+    """Fichiers désignés par des motifs glob et/ou un manifeste, sans doublon
+
+    Le manifeste est un fichier texte avec un chemin ou un motif par ligne (relatif au
+    dossier du manifeste) ; les lignes vides et celles commençant par # sont ignorées.
+    """
+    motifs = list(motifs)
+    if manifeste:
+        dossier = os.path.dirname(os.path.abspath(manifeste))
+        with open(manifeste, encoding='utf-8') as f:
+            for ligne in f:
+                ligne = ligne.strip()
+                if ligne and not ligne.startswith('#'):
+                    motifs.append(ligne if os.path.isabs(ligne) else os.path.join(dossier, ligne))
+
+    fichiers = {}
+    for motif in motifs:
+        trouves = sorted(glob.glob(motif)) if glob.has_magic(motif) else [motif]
+        if not trouves:
+            print(f"Aucun fichier ne correspond à {motif}")
+        for fichier in trouves:
+            if not os.path.isfile(fichier):
+                raise FileNotFoundError(f"Fichier introuvable : {fichier}")
+            fichiers.setdefault(os.path.abspath(fichier), fichier)
+    return list(fichiers.values())
+
+
+def trier_par_date(fichiers):
+    """Trie les fichiers du plus ancien au plus récent
+
+    La date d'extraction du nom de fichier (AAAA-MM-JJ) prime, puis la date de modification.
+    """
+    def cle(fichier):
+        date = MOTIF_DATE.search(os.path.basename(fichier))
+        return (date.group(1) if date else '', os.path.getmtime(fichier), fichier)
+    return sorted(fichiers, key=cle)
+
+
+def masques_plus_recents(ids_par_fichier):
+    """Masques des lignes à garder pour ne conserver que la copie la plus récente de chaque ID
+
+    ids_par_fichier est ordonné du fichier le plus ancien au plus récent ; la dernière
+    occurrence d'un ID l'emporte (table de hachage de pandas, une seule passe). Les
+    lignes sans ID sont toujours gardées.
+    """
+    if not ids_par_fichier:
+        return []
+    ids = pd.Index(np.concatenate([np.asarray(ids) for ids in ids_par_fichier]))
+    garder = ~ids.duplicated(keep='last') | ids.isna()
+    return np.split(garder, np.cumsum([len(ids) for ids in ids_par_fichier])[:-1])
+
+
+def _charger_csv(fichier, metriques, taille_chunk, colonnes_texte):
+    """Chargeur de preparer_fichiers pour les resume_*.csv (lecture par morceaux typés)"""
+    return charger_donnees_par_chunks(fichier, taille_chunk, metriques, colonnes_texte)
+
+
+def _preparer_fichier(fichier, charger, version, colonne_id, dossier_cache):
+    """Tâche d'un processus : nettoie un fichier dans le cache colonnaire et retourne ses ID
+
+    Le DataFrame lui-même ne repasse pas par le processus principal, qui le relira
+    depuis le cache (mappé en mémoire) après la déduplication.
+    """
+    metriques = Metriques(progression=False)
+    entree, _ = remplir_cache(fichier, lambda f: charger(f, metriques), version, dossier_cache)
+    ids = lire_cache(entree, colonnes=[colonne_id])[colonne_id]
+    ids = ids.to_numpy(dtype=float) if pd.api.types.is_numeric_dtype(ids) else ids.to_numpy()
+    return entree, ids, dict(metriques.compteurs)
+
+
+def preparer_fichiers(fichiers, charger, version, colonne_id, n_workers=None, dossier_cache=DOSSIER_CACHE,
+                      metriques=None):
+    """Remplit le cache colonnaire pour chaque fichier, un processus par fichier
+
+    charger(fichier, metriques) lit et nettoie un fichier ; il doit être picklable
+    (fonction de module ou functools.partial). Retourne (entrée de cache, ID) par
+    fichier, dans l'ordre de fichiers. Sans pool de processus disponible, les fichiers
+    sont préparés en série.
+    """
+    metriques = metriques or Metriques()
+    os.makedirs(dossier_cache, exist_ok=True)
+    arguments = (fichiers, repeat(charger), repeat(version), repeat(colonne_id), repeat(dossier_cache))
+    if n_workers == 1 or len(fichiers) <= 1:
+        preparations = list(metriques.barre(map(_preparer_fichier, *arguments), total=len(fichiers),
+                                            desc="Fichiers"))
+    else:
+        try:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                preparations = list(metriques.barre(executor.map(_preparer_fichier, *arguments),
+                                                    total=len(fichiers), desc="Fichiers"))
+        except (BrokenProcessPool, OSError) as erreur:
+            print(f"Pool de processus indisponible ({erreur}), lecture en série")
+            preparations = [_preparer_fichier(*args) for args in zip(*arguments)]
+    for _, _, compteurs in preparations:
+        for nom, valeur in compteurs.items():
+            metriques.compter(nom, valeur)
+    return [(entree, ids) for entree, ids, _ in preparations]
+
+
+def charger_lot(fichiers, n_workers=None, dossier_cache=DOSSIER_CACHE, taille_chunk=100_000, metriques=None,
+                taille_max_cache=TAILLE_MAX_CACHE, colonnes_texte=False):
+    """Charge, nettoie et fusionne plusieurs resume_*.csv en un seul DataFrame
+
+    Les fichiers sont lus en parallèle (un processus par fichier, lecture par morceaux
+    typés) et écrits dans le cache colonnaire ; seules leurs colonnes ID reviennent
+    au processus principal. Les doublons d'ID entre fichiers sont résolus en une
+    passe (la copie du fichier le plus récent est gardée), puis les lignes retenues
+    sont lues depuis le cache et concaténées une seule fois. La colonne Fichier
+    indique le fichier d'origine de chaque annonce. colonnes_texte lit aussi les
+    titres, descriptions et villes (nécessaires à regrouper_reposts).
+    """
+    metriques = metriques or Metriques()
+    fichiers = trier_par_date(fichiers)
+
+    with metriques.etape('lecture_lot'):
+        charger = partial(_charger_csv, taille_chunk=taille_chunk, colonnes_texte=colonnes_texte)
+        version = VERSION_CACHE_CHUNKS_TEXTE if colonnes_texte else VERSION_CACHE_CHUNKS
+        preparations = preparer_fichiers(fichiers, charger, version, 'ID', n_workers, dossier_cache, metriques)
+        metriques.compter('fichiers', len(fichiers))
+
+    with metriques.etape('deduplication'):
+        masques = masques_plus_recents([ids for _, ids in preparations])
+        lignes = sum(len(masque) for masque in masques)
+        gardees = sum(int(masque.sum()) for masque in masques)
+        metriques.compter('doublons_retires', lignes - gardees)
+        print(f"{len(fichiers)} fichiers, {lignes} annonces dont {lignes - gardees} doublons retirés")
+
+    with metriques.etape('fusion'):
+        morceaux = []
+        for fichier, (entree, _), garder in zip(fichiers, preparations, masques):
+            if not garder.any():
+                continue
+            morceau = lire_cache(entree)[garder]
+            morceau['Fichier'] = pd.Categorical.from_codes(np.zeros(len(morceau), dtype=np.int8),
+                                                           categories=[os.path.basename(fichier)])
+            morceaux.append(morceau)
+        if morceaux:
+            df = _concatener_categoriels(morceaux, ignore_index=True)
+        else:
+            df = pd.DataFrame(columns=['ID', 'Prix', 'Marque', 'Modele', 'Année', 'Kilométrage', 'URL', 'Fichier'])
+        metriques.compter('lignes_chargees', len(df))
+
+    evincer(dossier_cache, taille_max_cache)
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyse fusionnée de plusieurs extractions resume_*.csv")
+    parser.add_argument('motifs', nargs='*', help="Fichiers ou motifs glob, ex. 'resume_2025-01-*V2.csv'")
+    parser.add_argument('--manifeste', help="Fichier listant un chemin ou un motif par ligne")
+    parser.add_argument('--workers', type=int, default=None, help="Nombre de processus de lecture")
+    parser.add_argument('--dossier-cache', default=DOSSIER_CACHE)
+    parser.add_argument('--format', default='xlsx', choices=['xlsx', 'parquet', 'csv'])
+    parser.add_argument('--dossier-etat', help="Active l'analyse incrémentale (voir analyse_incrementale)")
+    parser.add_argument('--modele-prix', default='modele_prix.json', help="Coefficients de régression des prix")
+    parser.add_argument('--reajuster-modele', action='store_true',
+                        help="Réajuste le modèle de prix (--modele-prix, ou celui de l'état incrémental)")
+    parser.add_argument('--reposts', action='store_true',
+                        help="Regroupe les reposts avant l'analyse (lit aussi titres, descriptions et villes)")
+    arguments = parser.parse_args()
+
+    fichiers = lister_fichiers(arguments.motifs, arguments.manifeste)
+    if not fichiers:
+        parser.error("aucun fichier à analyser")
+    metriques = Metriques()
+    df = charger_lot(fichiers, arguments.workers, arguments.dossier_cache, metriques=metriques,
+                     colonnes_texte=arguments.reposts)
+    analyseur = AnalyseurVoitures.depuis_dataframe(df, metriques)
+    analyseur.fichier_modele_prix = arguments.modele_prix
+    if arguments.reposts:
+        analyseur.regrouper_reposts()
+    analyseur.generer_rapport_complet(arguments.dossier_etat, arguments.format, arguments.reajuster_modele)
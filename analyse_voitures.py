@@ -1,70 +1,417 @@
 import pandas as pd
 import json
+import os
+import sys
+import heapq
 import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import numpy as np
+from cache_colonnes import DOSSIER_CACHE, TAILLE_MAX_CACHE, charger_avec_cache, evincer, lire_cache
+from instrumentation import Metriques
+
+CLEANING_VERSION = 1  # À incrémenter à chaque changement de clean_data (invalide le cache)
+CACHE_VERSION = f"v{CLEANING_VERSION}-json"
+
+# Colonnes produites par load_data -> chemin du champ dans une annonce
+AD_FIELDS = {
+    'id': ('id',),
+    'titre': ('titre',),
+    'prix': ('prix',),
+    'date_publication': ('date_publication',),
+    'marque': ('caracteristiques', 'marque'),
+    'modele': ('caracteristiques', 'modele'),
+    'annee': ('caracteristiques', 'annee'),
+    'kilometrage': ('caracteristiques', 'kilometrage'),
+    'carburant': ('caracteristiques', 'carburant'),
+    'boite': ('caracteristiques', 'boite'),
+    'vendeur_type': ('vendeur', 'type'),
+    'vendeur_nom': ('vendeur', 'nom'),
+    'ville': ('localisation', 'ville'),
+    'code_postal': ('localisation', 'code_postal'),
+    'departement': ('localisation', 'departement'),
+    'url': ('url',),
+}
+# Colonnes à faible cardinalité : les chaînes identiques partagent un seul objet
+INTERNED_FIELDS = {'marque', 'modele', 'annee', 'carburant', 'boite', 'vendeur_type',
+                   'ville', 'code_postal', 'departement'}
+STREAM_CHUNK_SIZE = 1 << 20
+DEALS_CHUNK_SIZE = 100_000  # Annonces notées à la fois par rank_deals
+DENSITY_BINS = (120, 80)  # Cases (kilométrage, prix) de la carte de densité
+DENSITY_PANELS = 4  # Types de vendeur les plus fréquents affichés sur la carte de densité
+
+def iter_annonces(f, chunk_size=STREAM_CHUNK_SIZE):
+    """Itère une à une sur les annonces d'un fichier resultats_*.json ouvert
+
+    Le fichier est lu par blocs de chunk_size caractères et chaque annonce est
+    décodée par raw_decode dès qu'elle est complète : seule l'annonce courante
+    est en mémoire, jamais le document entier.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = '', 0, False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return not eof
+
+    def skip(separators=''):
+        # Avance jusqu'au prochain caractère significatif ('' en fin de fichier)
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] in separators):
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if not fill():
+                return ''
+
+    def decode():
+        nonlocal pos
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if fill():
+                    continue
+                raise
+            # Un nombre en fin de bloc peut se poursuivre dans le bloc suivant
+            if end == len(buffer) and not eof and fill():
+                continue
+            pos = end
+            return value
+
+    if skip() != '{':
+        raise ValueError("Format JSON inattendu : un objet est attendu à la racine")
+    pos += 1
+    while skip(',') not in ('}', ''):
+        key = decode()
+        if skip() != ':':
+            raise ValueError(f"Format JSON inattendu après la clé {key!r}")
+        pos += 1
+        if key != 'annonces':
+            skip()
+            decode()
+            continue
+        if skip() != '[':
+            raise ValueError("Format JSON inattendu : 'annonces' doit être un tableau")
+        pos += 1
+        while True:
+            char = skip(',')
+            if char == ']':
+                return
+            if char == '':
+                raise ValueError("Tableau 'annonces' incomplet")
+            yield decode()
+
+def load_data(filename, metrics=None):
+    """Charge les annonces en flux et remplit directement les colonnes de AD_FIELDS
+
+    Les champs non utilisés (description, images...) ne sont jamais conservés ; les
+    annonces incomplètes sont comptées et signalées en une seule ligne.
+    """
+    columns = {name: [] for name in AD_FIELDS}
+    interned = [name in INTERNED_FIELDS for name in AD_FIELDS]
+    malformed = 0
 
-def load_data(filename):
     with open(filename, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    # Transformer les annonces en DataFrame
-    formatted_ads = []
-    for ad in data['annonces']:
-        try:
-            formatted_ad = {
-                'id': ad['id'],
-                'titre': ad['titre'],
-                'prix': ad['prix'],
-                'date_publication': ad['date_publication'],
-                'marque': ad['caracteristiques']['marque'],
-                'modele': ad['caracteristiques']['modele'],
-                'annee': ad['caracteristiques']['annee'],
-                'kilometrage': ad['caracteristiques']['kilometrage'],
-                'carburant': ad['caracteristiques']['carburant'],
-                'boite': ad['caracteristiques']['boite'],
-                'vendeur_type': ad['vendeur']['type'],
-                'vendeur_nom': ad['vendeur']['nom'],
-                'ville': ad['localisation']['ville'],
-                'code_postal': ad['localisation']['code_postal'],
-                'departement': ad['localisation']['departement'],
-                'url': ad['url']
-            }
-            formatted_ads.append(formatted_ad)
-        except KeyError as e:
-            print(f"Erreur lors de l'extraction des données pour l'annonce ID {ad.get('id', 'inconnue')}: {e}")
-        except Exception as e:
-            print(f"Erreur inattendue pour l'annonce ID {ad.get('id', 'inconnue')}: {e}")
-    
-    df = pd.DataFrame(formatted_ads)
+        for ad in iter_annonces(f):
+            try:
+                values = []
+                for path in AD_FIELDS.values():
+                    value = ad
+                    for key in path:
+                        value = value[key]
+                    values.append(value)
+            except (KeyError, TypeError, IndexError):
+                malformed += 1
+                continue
+            for column, intern, value in zip(columns.values(), interned, values):
+                column.append(sys.intern(value) if intern and type(value) is str else value)
+
+    if malformed:
+        print(f"{malformed} annonce(s) ignorée(s) car incomplète(s) ou mal formée(s)")
+    if metrics is not None:
+        metrics.compter('lignes_lues', len(columns['id']) + malformed)
+        metrics.compter('annonces_mal_formees', malformed)
+
+    df = pd.DataFrame(columns) if columns['id'] else pd.DataFrame()
     
     # Afficher les colonnes disponibles pour débogage
     print("Colonnes disponibles dans le DataFrame :", df.columns.tolist())
     
     return df
 
-def find_good_deals(df):
-    """Trouve les meilleures affaires en comparant prix/km/année"""
+def clean_data(df, metrics=None):
+    """Nettoie les prix/kilométrages et retire les valeurs manquantes ou aberrantes"""
+    rows_in = len(df)
+    df['prix'] = pd.to_numeric(df['prix'], errors='coerce')
+    df['kilometrage'] = df['kilometrage'].str.replace(r'\D', '', regex=True)  # Retirer tous les non-chiffres
+    df['kilometrage'] = pd.to_numeric(df['kilometrage'], errors='coerce')
+
+    # Supprimer les lignes avec des valeurs manquantes importantes
+    df = df.dropna(subset=['prix', 'kilometrage', 'annee'])
+    
+    # Filtrer les valeurs aberrantes
+    df = df[
+        (df['prix'] > 500) & 
+        (df['prix'] < df['prix'].quantile(0.99)) &  # Exclure les prix extrêmes
+        (df['kilometrage'] < 300000)  # Exclure les kilométrages extrêmes
+    ]
+    if metrics is not None:
+        metrics.compter('lignes_rejetees', rows_in - len(df))
+    return df
+
+def load_and_clean(filename, metrics):
+    """Lit puis nettoie un fichier JSON, étape par étape dans metrics"""
+    with metrics.etape('lecture'):
+        df = load_data(filename, metrics)
+    with metrics.etape('nettoyage'):
+        return clean_data(df, metrics)
+
+def load_clean_data(filename, cache_dir=None, metrics=None):
+    """Charge et nettoie le fichier JSON, via le cache colonnaire si cache_dir est fourni"""
+    metrics = metrics or Metriques()
+    with metrics.etape('chargement'):
+        if cache_dir:
+            df = charger_avec_cache(filename, lambda f: load_and_clean(f, metrics), CACHE_VERSION, cache_dir)
+        else:
+            df = load_and_clean(filename, metrics)
+        metrics.compter('lignes_chargees', len(df))
+    return df
+
+def load_clean_files(patterns, cache_dir=DOSSIER_CACHE, metrics=None, workers=None,
+                     max_cache_size=TAILLE_MAX_CACHE):
+    """Charge plusieurs fichiers JSON (motifs glob acceptés) en parallèle et les fusionne
+
+    Chaque fichier est chargé et nettoyé dans un processus qui l'écrit dans le cache
+    colonnaire (cache_dir) ; seuls ses id reviennent au processus principal. Une annonce
+    présente dans plusieurs fichiers n'est gardée qu'une fois, dans sa version la plus
+    récente, puis les lignes retenues sont relues depuis le cache. Sans pool de
+    processus disponible, les fichiers sont lus en série.
+    """
+    from analyse_lot import lister_fichiers, masques_plus_recents, preparer_fichiers, trier_par_date
+
+    metrics = metrics or Metriques()
+    filenames = trier_par_date(lister_fichiers(patterns))
+    with metrics.etape('chargement'):
+        preparations = preparer_fichiers(filenames, load_and_clean, CACHE_VERSION, 'id', workers, cache_dir, metrics)
+        keep = masques_plus_recents([ids for _, ids in preparations])
+        frames = [lire_cache(entry)[mask] for (entry, _), mask in zip(preparations, keep) if mask.any()]
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        metrics.compter('fichiers', len(filenames))
+        metrics.compter('doublons_retires', sum(len(mask) - int(mask.sum()) for mask in keep))
+        metrics.compter('lignes_chargees', len(df))
+    evincer(cache_dir, max_cache_size)
+    print(f"{len(filenames)} fichier(s) chargé(s), {len(df)} annonces après dédoublonnage")
+    return df
+
+def _clean_mileage(df):
+    """Kilométrage numérique de chaque annonce ("80 000 km" -> 80000, NaN si illisible)"""
+    kilometrage = df['kilometrage']
+    if not pd.api.types.is_numeric_dtype(kilometrage):
+        kilometrage = kilometrage.astype(str).str.replace(r'\D', '', regex=True)
+    return pd.to_numeric(kilometrage, errors='coerce').to_numpy(dtype=float)
+
+def deal_scores(df, reference_year=None):
+    """Score de chaque annonce (plus il est bas, meilleure est l'affaire), sans modifier df
+
+    score = prix / âge * 0.4 + prix / kilométrage * 10000 * 0.6, avec l'âge compté
+    depuis reference_year (année en cours par défaut).
+    """
+    reference_year = reference_year or datetime.now().year
+    prix = pd.to_numeric(df['prix'], errors='coerce').to_numpy(dtype=float)
+    annee = pd.to_numeric(df['annee'], errors='coerce').to_numpy(dtype=float)
+    kilometrage = _clean_mileage(df)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return prix / (reference_year - annee) * 0.4 + prix / kilometrage * 10000 * 0.6
+
+def rank_deals(df, tops, reference_year=None, chunk_size=DEALS_CHUNK_SIZE):
+    """Meilleures affaires en une passe par morceaux, pour plusieurs classements à la fois
+
+    tops associe une colonne de partition (ex. 'marque', 'departement') ou None (classement
+    global) au nombre d'affaires à garder par valeur. Chaque classement tient un tas de
+    taille k par partition : la mémoire reste en O(k x partitions) quel que soit len(df).
+    Retourne {partition: DataFrame} avec les colonnes de df et age, prix_par_annee,
+    prix_par_km et score, calculées sur les seules lignes retenues (df n'est pas modifié).
+    """
+    reference_year = reference_year or datetime.now().year
+    heaps = {by: {} for by in tops}
+
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        scores = deal_scores(chunk, reference_year)
+        positions = np.arange(start, start + len(chunk))
+        for by, k in tops.items():
+            if by is None:
+                codes, values = np.zeros(len(chunk), dtype=np.int64), [None]
+            else:
+                codes, values = pd.factorize(chunk[by])
+            valid = np.flatnonzero((codes >= 0) & ~np.isnan(scores))
+            # Candidats du morceau : ses k meilleurs par partition (tri par partition, score, position)
+            order = valid[np.lexsort((positions[valid], scores[valid], codes[valid]))]
+            sorted_codes = codes[order]
+            group_starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+            ranks = np.arange(len(order)) - np.repeat(group_starts, np.diff(np.r_[group_starts, len(order)]))
+            candidates = order[ranks < k]
+            for code, score, position in zip(codes[candidates].tolist(), scores[candidates].tolist(),
+                                             positions[candidates].tolist()):
+                # Tas max sur (score, position) : la racine est la moins bonne affaire gardée
+                heap = heaps[by].setdefault(values[code], [])
+                if len(heap) < k:
+                    heapq.heappush(heap, (-score, -position))
+                elif (score, position) < (-heap[0][0], -heap[0][1]):
+                    heapq.heapreplace(heap, (-score, -position))
+
+    results = {}
+    for by, partitions in heaps.items():
+        positions = sorted(-position for heap in partitions.values() for _, position in heap)
+        result = df.iloc[positions].copy()
+        result['age'] = reference_year - pd.to_numeric(result['annee'])
+        result['prix_par_annee'] = result['prix'] / result['age']
+        result['prix_par_km'] = result['prix'] / _clean_mileage(result)
+        result['score'] = deal_scores(result, reference_year)
+        results[by] = result.sort_values(['score'] if by is None else [by, 'score'], kind='stable')
+    return results
+
+def find_good_deals(df, k=100, by=None, reference_year=None):
+    """Trouve les meilleures affaires en comparant prix/km/année
+
+    by='marque' ou by='departement' donne les k meilleures de chaque marque ou département.
+    """
     # Vérifier si 'kilometrage' existe
     if 'kilometrage' not in df.columns:
         print("Erreur : 'kilometrage' n'est pas une colonne dans le DataFrame.")
         return pd.DataFrame()  # Retourner un DataFrame vide
 
-    # Calculer le score de chaque voiture
-    df['age'] = 2024 - pd.to_numeric(df['annee'])
-    df['prix_par_annee'] = df['prix'] / (2024 - pd.to_numeric(df['annee']))
-    df['prix_par_km'] = df['prix'] / df['kilometrage'].replace({'\D': ''}, regex=True).astype(float)  # Nettoyer et convertir
+    return rank_deals(df, {by: k}, reference_year)[by]
 
-    # Calculer un score global (plus le score est bas, meilleure est l'affaire)
-    df['score'] = (
-        df['prix_par_annee'] * 0.4 + 
-        df['prix_par_km'] * 10000 * 0.6
-    )
-    
-    return df.nsmallest(100, 'score')
+def price_box_stats(df):
+    """Statistiques de boîte à moustaches des prix par marque (quartiles, moustaches à 1,5 IQR)
+
+    Retourne la liste de dicts attendue par Axes.bxp ; les valeurs extrêmes ne sont pas
+    tracées, seul leur nombre est conservé.
+    """
+    data = df[['marque', 'prix']].dropna()
+    groups = data.groupby('marque', sort=True)['prix']
+    quartiles = groups.quantile([0.25, 0.5, 0.75]).unstack()
+    iqr = quartiles[0.75] - quartiles[0.25]
+    low, high = quartiles[0.25] - 1.5 * iqr, quartiles[0.75] + 1.5 * iqr
+    # Moustaches : valeurs extrêmes encore dans [Q1 - 1,5 IQR, Q3 + 1,5 IQR]
+    inside = data['prix'].between(data['marque'].map(low), data['marque'].map(high))
+    whiskers = data[inside.to_numpy()].groupby('marque', sort=True)['prix'].agg(['min', 'max'])
+    outliers = (~inside).groupby(data['marque'].to_numpy()).sum()
+    return [
+        {
+            'label': marque, 'q1': quartiles.at[marque, 0.25], 'med': quartiles.at[marque, 0.5],
+            'q3': quartiles.at[marque, 0.75], 'whislo': whiskers.at[marque, 'min'],
+            'whishi': whiskers.at[marque, 'max'], 'fliers': [], 'outliers': int(outliers.get(marque, 0)),
+        }
+        for marque in quartiles.index
+    ]
+
+def price_km_density(df, bins=DENSITY_BINS, panels=DENSITY_PANELS):
+    """Histogrammes 2D prix/kilométrage par type de vendeur, sur une grille commune
+
+    Les bornes sont les quantiles 0,5 % et 99,5 % pour que quelques valeurs extrêmes
+    n'écrasent pas la carte. Retourne (bords km, bords prix, {type de vendeur: comptes}).
+    """
+    data = df[['kilometrage', 'prix', 'vendeur_type']].dropna(subset=['kilometrage', 'prix'])
+    km = data['kilometrage'].to_numpy(dtype=float)
+    prix = data['prix'].to_numpy(dtype=float)
+    km_range = tuple(np.quantile(km, [0.005, 0.995])) if len(km) else (0, 1)
+    prix_range = tuple(np.quantile(prix, [0.005, 0.995])) if len(prix) else (0, 1)
+    _, km_edges, prix_edges = np.histogram2d([], [], bins=bins, range=[km_range, prix_range])
+
+    sellers = data['vendeur_type'].fillna('inconnu').astype(str).to_numpy()
+    counts = {}
+    for seller in pd.Series(sellers).value_counts().index[:panels]:
+        mask = sellers == seller
+        counts[seller] = np.histogram2d(km[mask], prix[mask], bins=(km_edges, prix_edges))[0]
+    return km_edges, prix_edges, counts
+
+def yearly_fuel_means(df):
+    """Prix moyen par année (en lignes) et carburant (en colonnes)"""
+    data = df.assign(annee=pd.to_numeric(df['annee'], errors='coerce'))[['annee', 'carburant', 'prix']]
+    return data.groupby(['annee', 'carburant'], sort=True)['prix'].mean().unstack('carburant')
+
+def plot_price_boxes(stats, filename):
+    """Boîtes à moustaches des prix par marque depuis price_box_stats"""
+    fig, ax = plt.subplots(figsize=(15, 8))
+    ax.bxp(stats, showfliers=False)
+    ax.tick_params(axis='x', rotation=45)
+    ax.set_ylabel('prix')
+    ax.set_title('Distribution des prix par marque')
+    fig.tight_layout()
+    fig.savefig(filename)
+    plt.close(fig)
+    return filename
 
-def analyze_data(df):
+def plot_price_km_density(density, filename):
+    """Cartes de densité prix/kilométrage par type de vendeur depuis price_km_density"""
+    from matplotlib.colors import LogNorm
+
+    km_edges, prix_edges, counts = density
+    fig, axes = plt.subplots(1, max(len(counts), 1), figsize=(15, 8), sharey=True, squeeze=False)
+    for ax, (seller, count) in zip(axes[0], counts.items()):
+        mesh = ax.pcolormesh(km_edges, prix_edges, np.ma.masked_equal(count.T, 0), norm=LogNorm(), cmap='viridis')
+        ax.set_title(f"{seller} ({int(count.sum())} annonces)")
+        ax.set_xlabel('kilometrage')
+    axes[0][0].set_ylabel('prix')
+    if counts:
+        fig.colorbar(mesh, ax=axes[0].tolist(), label="Nombre d'annonces")
+    fig.suptitle('Prix vs Kilométrage par type de vendeur')
+    fig.savefig(filename)
+    plt.close(fig)
+    return filename
+
+def plot_yearly_means(means, filename):
+    """Prix moyen par année et carburant depuis yearly_fuel_means (sans intervalle bootstrap)"""
+    fig, ax = plt.subplots(figsize=(15, 8))
+    for carburant in means.columns:
+        ax.plot(means.index, means[carburant], marker='o', markersize=3, label=carburant)
+    ax.set_xlabel('annee')
+    ax.set_ylabel('prix')
+    ax.legend(title='carburant')
+    ax.set_title('Évolution des prix par année et type de carburant')
+    fig.savefig(filename)
+    plt.close(fig)
+    return filename
+
+def render_charts(df, workers=3):
+    """Graphiques agrégés : les agrégats sont calculés ici, le dessin dans des processus
+
+    Chaque processus ne reçoit que quelques centaines de valeurs agrégées, le temps de
+    dessin ne dépend donc pas du nombre d'annonces.
+    """
+    jobs = [
+        (plot_price_boxes, price_box_stats(df), 'analyses/prix_par_marque.png'),
+        (plot_price_km_density, price_km_density(df), 'analyses/prix_km_vendeur.png'),
+        (plot_yearly_means, yearly_fuel_means(df), 'analyses/evolution_prix_carburant.png'),
+    ]
+    if workers and workers > 1:
+        try:
+            # Backend sans affichage dans les processus de dessin seulement : celui de l'appelant ne change pas
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), initializer=plt.switch_backend,
+                                     initargs=('Agg',)) as executor:
+                futures = [executor.submit(plot, data, filename) for plot, data, filename in jobs]
+                return [future.result() for future in futures]
+        except (BrokenProcessPool, OSError) as e:
+            print(f"Rendu parallèle indisponible ({e}), rendu en série")
+    return [plot(data, filename) for plot, data, filename in jobs]
+
+def analyze_data(df, metrics=None, charts='aggregated'):
+    """Graphiques et rapport texte
+
+    charts='aggregated' trace des agrégats en parallèle (render_charts) ;
+    charts='detailed' conserve les graphiques seaborn de chaque annonce.
+    """
+    metrics = metrics or Metriques()
     print("\nInformations sur les données :")
     print(df.info())
     
@@ -72,31 +419,37 @@ def analyze_data(df):
     import os
     os.makedirs('analyses', exist_ok=True)
     
-    # 1. Analyse des prix
-    plt.figure(figsize=(15, 8))
-    sns.boxplot(data=df, x='marque', y='prix')
-    plt.xticks(rotation=45)
-    plt.title('Distribution des prix par marque')
-    plt.tight_layout()
-    plt.savefig('analyses/prix_par_marque.png')
-    plt.close()
-
-    # 2. Relation prix/kilométrage par type de vendeur
-    plt.figure(figsize=(15, 8))
-    sns.scatterplot(data=df, x='kilometrage', y='prix', hue='vendeur_type', alpha=0.6)
-    plt.title('Prix vs Kilométrage par type de vendeur')
-    plt.savefig('analyses/prix_km_vendeur.png')
-    plt.close()
-
-    # 3. Prix moyen par année et carburant
-    plt.figure(figsize=(15, 8))
-    sns.lineplot(data=df, x='annee', y='prix', hue='carburant')
-    plt.title('Évolution des prix par année et type de carburant')
-    plt.savefig('analyses/evolution_prix_carburant.png')
-    plt.close()
+    with metrics.etape('graphiques'):
+        if charts == 'aggregated':
+            render_charts(df)
+        elif charts == 'detailed':
+            # 1. Analyse des prix
+            plt.figure(figsize=(15, 8))
+            sns.boxplot(data=df, x='marque', y='prix')
+            plt.xticks(rotation=45)
+            plt.title('Distribution des prix par marque')
+            plt.tight_layout()
+            plt.savefig('analyses/prix_par_marque.png')
+            plt.close()
+
+            # 2. Relation prix/kilométrage par type de vendeur
+            plt.figure(figsize=(15, 8))
+            sns.scatterplot(data=df, x='kilometrage', y='prix', hue='vendeur_type', alpha=0.6)
+            plt.title('Prix vs Kilométrage par type de vendeur')
+            plt.savefig('analyses/prix_km_vendeur.png')
+            plt.close()
+
+            # 3. Prix moyen par année et carburant
+            plt.figure(figsize=(15, 8))
+            sns.lineplot(data=df, x='annee', y='prix', hue='carburant')
+            plt.title('Évolution des prix par année et type de carburant')
+            plt.savefig('analyses/evolution_prix_carburant.png')
+            plt.close()
+        else:
+            raise ValueError(f"Mode de graphiques inconnu : {charts}")
 
     # Sauvegarder les résultats
-    with open(f'analyses/analyse_resultats_{datetime.now().strftime("%Y%m%d")}.txt', 'w', encoding='utf-8') as f:
+    with metrics.etape('rapport'), open(f'analyses/analyse_resultats_{datetime.now().strftime("%Y%m%d")}.txt', 'w', encoding='utf-8') as f:
         f.write("=== ANALYSE DU MARCHÉ AUTOMOBILE ===\n\n")
         
         # Statistiques générales
@@ -124,9 +477,11 @@ def analyze_data(df):
         f.write(vendeur_stats.to_string())
         f.write("\n\n")
         
-        # Meilleures affaires
+        # Meilleures affaires : classement global et par département, en une seule passe
         f.write("TOP 100 DES MEILLEURES AFFAIRES:\n")
-        best_deals = find_good_deals(df)
+        with metrics.etape('bonnes_affaires'):
+            rankings = rank_deals(df, {None: 100, 'departement': 5} if 'departement' in df.columns else {None: 100})
+            best_deals = rankings[None]
         for _, deal in best_deals.iterrows():
             f.write(f"\n{deal['marque']} {deal['modele']} ({deal['annee']})\n")
             f.write(f"Prix: {deal['prix']}€ | Kilométrage: {deal['kilometrage']}km\n")
@@ -134,33 +489,33 @@ def analyze_data(df):
             f.write(f"URL: {deal['url']}\n")
             f.write("-" * 80 + "\n")
 
-def main():
+        if 'departement' in rankings:
+            f.write("\nMEILLEURES AFFAIRES PAR DÉPARTEMENT:\n")
+            for departement, deals in rankings['departement'].groupby('departement', sort=False):
+                f.write(f"\n{departement}:\n")
+                for _, deal in deals.iterrows():
+                    f.write(f"  {deal['marque']} {deal['modele']} ({deal['annee']}) - {deal['prix']}€, "
+                            f"{deal['kilometrage']}km - {deal['url']}\n")
+
+def main(patterns=None, metrics=None):
+    metrics = metrics or Metriques()
     try:
-        # Charger les données
-        df = load_data('resultats_2025-01-13_voitures_brest_complet.json')
+        # Charger et nettoyer les données (depuis le cache si le fichier n'a pas changé)
+        if patterns:
+            df = load_clean_files(patterns, cache_dir='.cache_analyse', metrics=metrics)
+        else:
+            df = load_clean_data('resultats_2025-01-13_voitures_brest_complet.json', cache_dir='.cache_analyse',
+                                 metrics=metrics)
         print(df.head())  # Vérifie les premières lignes après nettoyage
-
-        # Nettoyer les données
-        df['prix'] = pd.to_numeric(df['prix'], errors='coerce')
-        df['kilometrage'] = df['kilometrage'].str.replace(r'\D', '', regex=True)  # Retirer tous les non-chiffres
-        df['kilometrage'] = pd.to_numeric(df['kilometrage'], errors='coerce')
-
-        # Supprimer les lignes avec des valeurs manquantes importantes
-        df = df.dropna(subset=['prix', 'kilometrage', 'annee'])
-        
-        # Filtrer les valeurs aberrantes
-        df = df[
-            (df['prix'] > 500) & 
-            (df['prix'] < df['prix'].quantile(0.99)) &  # Exclure les prix extrêmes
-            (df['kilometrage'] < 300000)  # Exclure les kilométrages extrêmes
-        ]
         
         # Analyser
-        analyze_data(df)
+        analyze_data(df, metrics)
         
+        metrics.ecrire(f'analyses/metriques_{datetime.now().strftime("%Y%m%d")}.json')
         print("Analyse terminée ! Vérifiez le dossier 'analyses' pour les résultats.")
     except Exception as e:
         print(f"Erreur lors de l'analyse : {str(e)}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    # Sans argument : le fichier habituel ; sinon les fichiers ou motifs donnés, fusionnés
+    main(sys.argv[1:]) 
\ No newline at end of file
@@ -0,0 +1,138 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import tempfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import analyse_voitures
+from algo_bonne_affaire_v2 import AnalyseurVoitures
+from export_resultats import EXPORTEURS
+from generateur_donnees import chemins_fichiers, generer_fichiers
+from instrumentation import Metriques
+
+TAILLES = [1_000, 10_000, 100_000, 1_000_000]
+ETAPES = [
+    '_charger_donnees',
+    'analyser_tendances_marche',
+    'detecter_anomalies_prix',
+    'trouver_bonnes_affaires',
+    'exporter_resultats',
+    'find_good_deals',
+]
+
+
+@contextlib.contextmanager
+def mesurer(metriques, resultats, taille, etape, verbeux=False):
+    """Mesure une étape avec metriques.etape : durée, RSS max et pic d'allocation si metriques.memoire
+
+    Les valeurs ajoutées par l'appelant à la mesure (lignes, format...) sont reprises dans le résultat.
+    """
+    mesure = {}
+    try:
+        with contextlib.ExitStack() as pile:
+            if not verbeux:
+                pile.enter_context(contextlib.redirect_stdout(pile.enter_context(open(os.devnull, 'w'))))
+            mesure = pile.enter_context(metriques.etape(etape))
+            yield mesure
+    finally:
+        resultats.append({'taille': taille, 'etape': etape,
+                          **{cle: valeur for cle, valeur in mesure.items() if cle not in ('nom', 'chemin')}})
+        print(f"  {etape:<28} {mesure['secondes']:>9.3f} s"
+              + (f"  pic {mesure['pic_memoire_mo']:>9.1f} Mo" if metriques.memoire else ''))
+
+
+def executer(tailles=TAILLES, etapes=ETAPES, dossier_donnees='donnees_synthetiques', graine=0,
+             profil_memoire=True, verbeux=False, formats_export=('xlsx',)):
+    """Exécute les étapes demandées pour chaque taille et retourne la liste des mesures
+
+    exporter_resultats est mesuré une fois par format de formats_export.
+    """
+    metriques = Metriques(memoire=profil_memoire, progression=verbeux)
+    resultats = []
+    for taille in tailles:
+        print(f"\nTaille {taille:,} annonces")
+        formats = ['csv'] + (['json'] if 'find_good_deals' in etapes else [])
+        chemins = chemins_fichiers(taille, dossier_donnees)
+        manquants = [fmt for fmt in formats if not os.path.exists(chemins[fmt])]
+        if manquants:
+            generer_fichiers(taille, dossier_donnees, manquants, graine)
+
+        analyseur = tendances = bonnes_affaires = None
+        if any(etape in etapes for etape in ETAPES[:5]):
+            with mesurer(metriques, resultats, taille, '_charger_donnees', verbeux) as mesure:
+                analyseur = AnalyseurVoitures(chemins['csv'], metriques=metriques)
+                mesure['lignes'] = len(analyseur.df)
+
+        if 'analyser_tendances_marche' in etapes or 'exporter_resultats' in etapes:
+            with mesurer(metriques, resultats, taille, 'analyser_tendances_marche', verbeux) as mesure:
+                tendances = analyseur.analyser_tendances_marche()
+                mesure['lignes'] = len(tendances)
+
+        if 'detecter_anomalies_prix' in etapes:
+            with mesurer(metriques, resultats, taille, 'detecter_anomalies_prix', verbeux) as mesure:
+                mesure['lignes'] = len(analyseur.detecter_anomalies_prix())
+
+        if 'trouver_bonnes_affaires' in etapes or 'exporter_resultats' in etapes:
+            with mesurer(metriques, resultats, taille, 'trouver_bonnes_affaires', verbeux) as mesure:
+                bonnes_affaires = analyseur.trouver_bonnes_affaires()
+                mesure['lignes'] = len(bonnes_affaires)
+
+        if 'exporter_resultats' in etapes:
+            for format_export in formats_export:
+                with tempfile.TemporaryDirectory() as dossier_tmp:
+                    with mesurer(metriques, resultats, taille, f'exporter_resultats[{format_export}]',
+                                 verbeux) as mesure:
+                        analyseur.exporter_resultats(bonnes_affaires, tendances,
+                                                     os.path.join(dossier_tmp, f'bench.{format_export}'))
+                        mesure['lignes'] = len(bonnes_affaires)
+                        mesure['format'] = format_export
+
+        if 'find_good_deals' in etapes:
+            df = analyse_voitures.load_clean_data(chemins['json'])
+            with mesurer(metriques, resultats, taille, 'find_good_deals', verbeux) as mesure:
+                mesure['lignes'] = len(analyse_voitures.find_good_deals(df))
+            del df
+
+        del analyseur, tendances, bonnes_affaires
+    return resultats
+
+
+def ecrire_rapport(resultats, fichier):
+    """Écrit les mesures et le contexte d'exécution en JSON, pour comparer les exécutions"""
+    rapport = {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'machine': platform.platform(),
+        'processeurs': os.cpu_count(),
+        'mesures': resultats,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(fichier)), exist_ok=True)
+    with open(fichier, 'w', encoding='utf-8') as f:
+        json.dump(rapport, f, ensure_ascii=False, indent=2)
+    return fichier
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark des étapes de l'analyse sur données synthétiques")
+    parser.add_argument('--tailles', type=int, nargs='+', default=TAILLES)
+    parser.add_argument('--etapes', nargs='+', default=ETAPES, choices=ETAPES)
+    parser.add_argument('--dossier-donnees', default='donnees_synthetiques')
+    parser.add_argument('--sortie', default=f'benchmarks/benchmark_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json')
+    parser.add_argument('--sans-profil-memoire', action='store_true',
+                        help="Désactive tracemalloc (temps plus représentatifs)")
+    parser.add_argument('--verbeux', action='store_true', help="Affiche la sortie des étapes")
+    parser.add_argument('--formats-export', nargs='+', default=['xlsx'], choices=list(EXPORTEURS),
+                        help="Formats mesurés pour exporter_resultats")
+    arguments = parser.parse_args()
+
+    mesures = executer(arguments.tailles, arguments.etapes, arguments.dossier_donnees,
+                       profil_memoire=not arguments.sans_profil_memoire, verbeux=arguments.verbeux,
+                       formats_export=arguments.formats_export)
+    print(f"\nRésultats enregistrés dans {ecrire_rapport(mesures, arguments.sortie)}")
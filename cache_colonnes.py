@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+DOSSIER_CACHE = '.cache_analyse'
+TAILLE_MAX_CACHE = 2 * 1024 ** 3  # 2 Go, au-delà les entrées les moins récemment lues sont supprimées
+FICHIER_META = 'meta.json'
+
+
+def hash_fichier(chemin, taille_bloc=1 << 20):
+    """Calcule l'empreinte BLAKE2b du contenu d'un fichier"""
+    empreinte = hashlib.blake2b(digest_size=16)
+    with open(chemin, 'rb') as f:
+        for bloc in iter(lambda: f.read(taille_bloc), b''):
+            empreinte.update(bloc)
+    return empreinte.hexdigest()
+
+
+def cle_cache(chemin, version):
+    """Clé d'une entrée : empreinte du fichier source + version des règles de nettoyage"""
+    return f"{hash_fichier(chemin)}_{version}"
+
+
+def _type_colonne(serie):
+    """Classe une colonne selon son stockage : numérique, catégorie ou texte"""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return 'categorie'
+    if isinstance(serie.dtype, np.dtype) and serie.dtype.kind in 'biufcmM':
+        return 'numerique'
+    return 'texte'
+
+
+def ecrire_cache(df, dossier_entree):
+    """Écrit un DataFrame en colonnes .npy mappables, les textes étant encodés par dictionnaire
+
+    L'entrée est écrite dans un dossier temporaire puis renommée : une entrée
+    présente sur disque est toujours complète.
+    """
+    parent = os.path.dirname(os.path.abspath(dossier_entree))
+    os.makedirs(parent, exist_ok=True)
+    dossier_tmp = tempfile.mkdtemp(dir=parent, prefix='.tmp_')
+    try:
+        colonnes = []
+        for i, (nom, serie) in enumerate(df.items()):
+            type_colonne = _type_colonne(serie)
+            meta = {'nom': nom, 'type': type_colonne, 'dtype': str(serie.dtype)}
+            if type_colonne == 'numerique':
+                np.save(os.path.join(dossier_tmp, f'col_{i}.npy'), serie.to_numpy())
+            else:
+                if type_colonne == 'categorie':
+                    codes, categories = serie.cat.codes.to_numpy(), serie.cat.categories
+                    meta['ordonnee'] = bool(serie.cat.ordered)
+                else:
+                    codes, categories = pd.factorize(serie.to_numpy(dtype=object))
+                np.save(os.path.join(dossier_tmp, f'col_{i}.npy'), codes.astype(np.int32))
+                with open(os.path.join(dossier_tmp, f'col_{i}.categories.json'), 'w', encoding='utf-8') as f:
+                    json.dump(list(categories), f, ensure_ascii=False, default=str)
+            colonnes.append(meta)
+
+        index_entier = df.index.dtype.kind in 'iu'
+        if index_entier:
+            np.save(os.path.join(dossier_tmp, 'index.npy'), df.index.to_numpy())
+        with open(os.path.join(dossier_tmp, FICHIER_META), 'w', encoding='utf-8') as f:
+            json.dump({'colonnes': colonnes, 'index': index_entier, 'lignes': len(df)}, f, ensure_ascii=False)
+
+        try:
+            os.replace(dossier_tmp, dossier_entree)
+        except OSError:
+            # Entrée écrite entre-temps par un autre processus : la sienne fait foi
+            if not os.path.isdir(dossier_entree):
+                raise
+            shutil.rmtree(dossier_tmp, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(dossier_tmp, ignore_errors=True)
+        raise
+
+
+def lire_cache(dossier_entree, colonnes=None):
+    """Relit une entrée du cache ; les colonnes numériques restent mappées en mémoire
+
+    Le mode copy-on-write ('c') laisse le fichier intact si l'appelant modifie le DataFrame.
+    colonnes limite la lecture à ces colonnes (les autres fichiers ne sont pas ouverts).
+    """
+    with open(os.path.join(dossier_entree, FICHIER_META), encoding='utf-8') as f:
+        meta = json.load(f)
+
+    donnees = {}
+    for i, colonne in enumerate(meta['colonnes']):
+        if colonnes is not None and colonne['nom'] not in colonnes:
+            continue
+        valeurs = np.load(os.path.join(dossier_entree, f'col_{i}.npy'), mmap_mode='c')
+        if colonne['type'] != 'numerique':
+            with open(os.path.join(dossier_entree, f'col_{i}.categories.json'), encoding='utf-8') as f:
+                categories = json.load(f)
+            if colonne['type'] == 'categorie':
+                dtype = pd.CategoricalDtype(categories, ordered=colonne['ordonnee'])
+                valeurs = pd.Categorical.from_codes(valeurs, dtype=dtype)
+            else:
+                valeurs = pd.Series(pd.Categorical.from_codes(valeurs, categories=pd.Index(categories, dtype=object)))
+                valeurs = valeurs.astype(object).astype(colonne['dtype']).to_numpy()
+        donnees[colonne['nom']] = valeurs
+
+    index = np.load(os.path.join(dossier_entree, 'index.npy'), mmap_mode='c') if meta['index'] else None
+    # Entrée relue : on la marque comme récente pour l'éviction
+    os.utime(os.path.join(dossier_entree, FICHIER_META))
+    return pd.DataFrame(donnees, index=index, copy=False)
+
+
+def taille_dossier(chemin):
+    """Taille totale en octets des fichiers d'un dossier"""
+    return sum(
+        os.path.getsize(os.path.join(racine, nom))
+        for racine, _, fichiers in os.walk(chemin)
+        for nom in fichiers
+    )
+
+
+def evincer(dossier_cache=DOSSIER_CACHE, taille_max=TAILLE_MAX_CACHE, a_garder=None):
+    """Supprime les entrées les moins récemment utilisées jusqu'à repasser sous taille_max"""
+    if not os.path.isdir(dossier_cache):
+        return []
+    entrees = []
+    for nom in os.listdir(dossier_cache):
+        chemin = os.path.join(dossier_cache, nom)
+        meta = os.path.join(chemin, FICHIER_META)
+        if os.path.isfile(meta):
+            entrees.append((os.path.getmtime(meta), chemin, taille_dossier(chemin)))
+
+    total = sum(taille for _, _, taille in entrees)
+    supprimees = []
+    for _, chemin, taille in sorted(entrees):
+        if total <= taille_max:
+            break
+        if a_garder and os.path.abspath(chemin) == os.path.abspath(a_garder):
+            continue
+        shutil.rmtree(chemin, ignore_errors=True)
+        total -= taille
+        supprimees.append(chemin)
+    return supprimees
+
+
+def remplir_cache(fichier_source, charger, version, dossier_cache=DOSSIER_CACHE):
+    """Garantit la présence de l'entrée de fichier_source dans le cache
+
+    charger(fichier_source) n'est appelé qu'en cas d'absence ; son résultat est écrit.
+    Retourne (dossier de l'entrée, True si l'entrée vient d'être écrite).
+    """
+    dossier_entree = os.path.join(dossier_cache, cle_cache(fichier_source, version))
+    if os.path.isfile(os.path.join(dossier_entree, FICHIER_META)):
+        return dossier_entree, False
+    ecrire_cache(charger(fichier_source), dossier_entree)
+    return dossier_entree, True
+
+
+def charger_avec_cache(fichier_source, charger, version, dossier_cache=DOSSIER_CACHE,
+                       taille_max=TAILLE_MAX_CACHE):
+    """Retourne le DataFrame nettoyé de fichier_source, depuis le cache s'il existe
+
+    charger(fichier_source) n'est appelé qu'en cas d'absence dans le cache ; son
+    résultat est alors écrit puis le cache est ramené sous taille_max.
+    """
+    dossier_entree, ecrite = remplir_cache(fichier_source, charger, version, dossier_cache)
+    if ecrite:
+        evincer(dossier_cache, taille_max, a_garder=dossier_entree)
+    else:
+        print(f"Chargement depuis le cache {dossier_entree}")
+    return lire_cache(dossier_entree)
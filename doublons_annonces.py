@@ -0,0 +1,163 @@
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+COLONNES_TEXTE = ['Titre', 'Description', 'Ville']
+COLONNES_ATTRIBUTS = ['Kilométrage', 'Carburant', 'Boite', 'Puissance din']  # Ajoutés au texte comme jetons
+COLONNES_BLOC = ['Marque', 'Modele', 'Année']  # Seules les annonces d'un même bloc sont comparées
+TAILLE_SHINGLE = 3  # Mots consécutifs par shingle
+NOMBRE_PERMUTATIONS = 32
+NOMBRE_BANDES = 8  # 8 bandes de 4 valeurs : paires candidates à partir d'environ 60 % de similarité
+SEUIL_SIMILARITE = 0.7  # Part minimale de valeurs MinHash égales pour confirmer un repost
+TAILLE_LOT = 50_000  # Annonces traitées à la fois pour le calcul des signatures
+
+# Constantes de mélange 64 bits (arithmétique modulo 2**64)
+_MULTIPLICATEURS_SHINGLE = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9], dtype=np.uint64)
+_MULTIPLICATEUR_BANDE = np.uint64(0x100000001B3)
+
+
+def _permutations(nombre, graine=0):
+    """Paramètres (xor, multiplicateur impair) des fonctions de hachage de MinHash"""
+    rng = np.random.default_rng(graine)
+    xors = rng.integers(0, 2 ** 64, nombre, dtype=np.uint64)
+    multiplicateurs = rng.integers(0, 2 ** 64, nombre, dtype=np.uint64) | np.uint64(1)
+    return xors, multiplicateurs
+
+
+def textes_annonces(df):
+    """Texte comparé pour chaque annonce : titre, description, ville et attributs du véhicule"""
+    textes = pd.Series('', index=df.index)
+    for colonne in COLONNES_TEXTE:
+        if colonne in df.columns:
+            textes = textes + ' ' + df[colonne].astype(str).where(df[colonne].notna(), '')
+    for colonne in COLONNES_ATTRIBUTS:
+        if colonne in df.columns:
+            textes = textes + f' {colonne}_' + df[colonne].astype(str).where(df[colonne].notna(), '')
+    # Ponctuation retirée : « Clio, » et « clio » donnent le même mot
+    return textes.str.lower().str.replace(r'[^\w\s]', ' ', regex=True)
+
+
+def _shingles(textes):
+    """Hachages 64 bits des shingles de mots de chaque texte
+
+    Retourne (hachages, debuts, nombres) : les shingles du texte i occupent
+    hachages[debuts[i]:debuts[i] + nombres[i]]. Un texte plus court que TAILLE_SHINGLE
+    donne un seul shingle avec les mots disponibles.
+    """
+    mots = textes.str.split()
+    longueurs = mots.str.len().to_numpy()
+    aplatis = np.fromiter(chain.from_iterable(mots.tolist()), dtype=object, count=int(longueurs.sum()))
+    jetons = pd.util.hash_array(aplatis) if len(aplatis) else np.empty(0, dtype=np.uint64)
+
+    fins = np.cumsum(longueurs)
+    debuts_mots = fins - longueurs
+    nombres = np.where(longueurs > 0, np.maximum(longueurs - TAILLE_SHINGLE + 1, 1), 0)
+    texte = np.repeat(np.arange(len(longueurs)), nombres)
+    positions = np.arange(nombres.sum()) - np.repeat(np.cumsum(nombres) - nombres, nombres) + debuts_mots[texte]
+
+    hachages = np.zeros(len(positions), dtype=np.uint64)
+    for k in range(TAILLE_SHINGLE):
+        # Les mots au-delà de la fin du texte sont remplacés par le dernier mot
+        indices = np.minimum(positions + k, fins[texte] - 1)
+        hachages += jetons[indices] * _MULTIPLICATEURS_SHINGLE[k]
+    return hachages, np.cumsum(nombres) - nombres, nombres
+
+
+def signatures_minhash(textes, nombre_permutations=NOMBRE_PERMUTATIONS, taille_lot=TAILLE_LOT, graine=0):
+    """Signatures MinHash (n, nombre_permutations) en uint32 des textes, calculées par lots
+
+    Chaque permutation est un hachage (h xor a) * b ; le minimum sur les shingles d'un
+    texte est pris par np.minimum.reduceat. Un texte sans mot a une signature vide
+    (toutes les valeurs au maximum) et n'est jamais rapproché d'un autre.
+    """
+    xors, multiplicateurs = _permutations(nombre_permutations, graine)
+    signatures = np.full((len(textes), nombre_permutations), np.iinfo(np.uint32).max, dtype=np.uint32)
+    for debut in range(0, len(textes), taille_lot):
+        hachages, debuts, nombres = _shingles(textes.iloc[debut:debut + taille_lot])
+        non_vides = np.flatnonzero(nombres > 0)
+        if len(non_vides) == 0:
+            continue
+        for p in range(nombre_permutations):
+            valeurs = ((hachages ^ xors[p]) * multiplicateurs[p]) >> np.uint64(32)
+            signatures[debut + non_vides, p] = np.minimum.reduceat(valeurs, debuts[non_vides]).astype(np.uint32)
+    return signatures
+
+
+def _composantes(n, sources, cibles):
+    """Composantes connexes d'un graphe de n sommets (union-find vectorisé)
+
+    Chaque tour raccroche la racine la plus grande de chaque arête à la plus petite,
+    puis compresse les chemins ; retourne la racine (plus petit sommet) de chaque sommet.
+    """
+    parent = np.arange(n)
+    while True:
+        while True:
+            compresse = parent[parent]
+            if np.array_equal(compresse, parent):
+                break
+            parent = compresse
+        racines_s, racines_c = parent[sources], parent[cibles]
+        differentes = racines_s != racines_c
+        if not differentes.any():
+            return parent
+        np.minimum.at(parent, np.maximum(racines_s, racines_c)[differentes],
+                      np.minimum(racines_s, racines_c)[differentes])
+
+
+def detecter_reposts(df, seuil=SEUIL_SIMILARITE, nombre_permutations=NOMBRE_PERMUTATIONS,
+                     nombre_bandes=NOMBRE_BANDES, taille_lot=TAILLE_LOT):
+    """Identifiant de groupe de repost de chaque annonce (np.ndarray aligné sur df)
+
+    Les signatures MinHash sont découpées en bandes (LSH) : deux annonces d'un même
+    bloc (Marque, Modele, Année) qui partagent une bande sont candidates, et le lien
+    est confirmé si la part de valeurs MinHash égales atteint seuil. Chaque bande
+    relie ses annonces à la première de son seau, sans énumérer les paires, donc le
+    coût reste proche de linéaire. Les groupes sont les composantes connexes des liens ;
+    une annonce sans repost forme son propre groupe. Les identifiants sont consécutifs.
+    """
+    if nombre_permutations % nombre_bandes:
+        raise ValueError("nombre_permutations doit être un multiple de nombre_bandes")
+    if not any(colonne in df.columns for colonne in COLONNES_TEXTE):
+        # Les attributs seuls rapprocheraient des voitures différentes de même fiche technique
+        raise ValueError(f"Détection des reposts impossible sans colonne de texte ({', '.join(COLONNES_TEXTE)})")
+    n = len(df)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+
+    colonnes_bloc = [col for col in COLONNES_BLOC if col in df.columns]
+    blocs = df.groupby(colonnes_bloc, sort=False, dropna=True, observed=True).ngroup().to_numpy()
+    signatures = signatures_minhash(textes_annonces(df), nombre_permutations, taille_lot)
+    comparables = (blocs >= 0) & (signatures[:, 0] != np.iinfo(np.uint32).max)
+    lignes = np.flatnonzero(comparables)
+
+    sources, cibles = [], []
+    largeur = nombre_permutations // nombre_bandes
+    for bande in range(nombre_bandes):
+        cle = blocs[lignes].astype(np.uint64)
+        for colonne in range(bande * largeur, (bande + 1) * largeur):
+            cle = cle * _MULTIPLICATEUR_BANDE + signatures[lignes, colonne]
+        seaux = pd.factorize(cle)[0]
+        premiers = pd.Series(lignes).groupby(seaux).transform('first').to_numpy()
+        lien = (premiers != lignes) & (blocs[premiers] == blocs[lignes])
+        sources.append(lignes[lien])
+        cibles.append(premiers[lien])
+
+    sources, cibles = np.concatenate(sources), np.concatenate(cibles)
+    # Vérification sur la signature complète (élimine aussi les collisions de hachage)
+    similarite = (signatures[sources] == signatures[cibles]).mean(axis=1)
+    confirmes = similarite >= seuil
+    racines = _composantes(n, sources[confirmes], cibles[confirmes])
+    return pd.factorize(racines)[0].astype(np.int64)
+
+
+def regrouper_reposts(df, groupes, colonne_recence='ID'):
+    """Garde une annonce par groupe de repost : la plus récente (plus grand colonne_recence)
+
+    L'ordre des lignes conservées est celui de df.
+    """
+    recence = pd.to_numeric(df[colonne_recence], errors='coerce').to_numpy(dtype=float)
+    recence = np.where(np.isnan(recence), -np.inf, recence)
+    ordre = np.lexsort((recence, groupes))
+    dernieres = ordre[np.r_[groupes[ordre][1:] != groupes[ordre][:-1], True]]
+    return df.iloc[np.sort(dernieres)]
@@ -0,0 +1,127 @@
+import importlib.util
+import os
+import re
+import unicodedata
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill, Font
+from openpyxl.utils import get_column_letter
+
+LIGNES_MAX_FEUILLE = 1_048_575  # Limite d'Excel (1 048 576 lignes, en-tête compris)
+TAILLE_BLOC = 50_000  # Lignes converties à la fois par l'export XLSX en flux
+LARGEUR_COLONNE = 15
+
+
+def nom_fichier_feuille(nom_fichier, feuille, extension):
+    """Fichier d'une feuille pour les formats à un tableau par fichier
+
+    ex. ('analyse.csv', 'Tendances Marché', '.csv') -> 'analyse_tendances_marche.csv'
+    """
+    racine = os.path.splitext(nom_fichier)[0]
+    suffixe = unicodedata.normalize('NFKD', feuille).encode('ascii', 'ignore').decode('ascii')
+    suffixe = re.sub(r'[^a-z0-9]+', '_', suffixe.lower()).strip('_')
+    return f"{racine}_{suffixe}{extension}"
+
+
+def _lignes(df, taille_bloc=TAILLE_BLOC):
+    """Lignes d'un DataFrame en tuples de valeurs Python, NaN remplacés par None
+
+    La conversion se fait par blocs pour ne jamais matérialiser tout le tableau en objets.
+    """
+    for debut in range(0, len(df), taille_bloc):
+        bloc = df.iloc[debut:debut + taille_bloc]
+        colonnes = []
+        for _, serie in bloc.items():
+            valeurs = serie.to_numpy(dtype=object)
+            valeurs[serie.isna().to_numpy()] = None
+            colonnes.append(valeurs)
+        yield from zip(*colonnes)
+
+
+class ExportXlsx:
+    """Classeur Excel écrit en flux (openpyxl write_only), mémoire constante
+
+    Les lignes sont écrites au fil de l'eau sans garder les cellules en mémoire ; une
+    feuille plus longue que la limite d'Excel continue dans 'Nom (2)', 'Nom (3)'...
+    """
+
+    extension = '.xlsx'
+
+    def ecrire(self, feuilles, nom_fichier):
+        classeur = Workbook(write_only=True)
+        police = Font(bold=True)
+        remplissage = PatternFill(start_color='CCCCCC', end_color='CCCCCC', fill_type='solid')
+
+        for nom, df in feuilles.items():
+            for partie, debut in enumerate(range(0, max(len(df), 1), LIGNES_MAX_FEUILLE), 1):
+                titre = nom if partie == 1 else f"{nom} ({partie})"
+                feuille = classeur.create_sheet(title=titre[:31])
+                for idx in range(1, len(df.columns) + 1):
+                    feuille.column_dimensions[get_column_letter(idx)].width = LARGEUR_COLONNE
+
+                entete = []
+                for colonne in df.columns:
+                    cellule = WriteOnlyCell(feuille, value=str(colonne))
+                    cellule.font = police
+                    cellule.fill = remplissage
+                    entete.append(cellule)
+                feuille.append(entete)
+
+                for ligne in _lignes(df.iloc[debut:debut + LIGNES_MAX_FEUILLE]):
+                    feuille.append(ligne)
+
+        classeur.save(nom_fichier)
+        return [nom_fichier]
+
+
+class ExportParquet:
+    """Un fichier Parquet par feuille (nécessite pyarrow)"""
+
+    extension = '.parquet'
+
+    def ecrire(self, feuilles, nom_fichier):
+        if importlib.util.find_spec('pyarrow') is None:
+            raise ImportError("L'export Parquet nécessite pyarrow (pip install pyarrow)")
+
+        fichiers = []
+        for nom, df in feuilles.items():
+            fichier = nom_fichier_feuille(nom_fichier, nom, self.extension)
+            df.to_parquet(fichier, index=False)
+            fichiers.append(fichier)
+        return fichiers
+
+
+class ExportCsv:
+    """Un fichier CSV par feuille, en UTF-8 avec BOM pour être lu correctement par Excel"""
+
+    extension = '.csv'
+
+    def ecrire(self, feuilles, nom_fichier):
+        fichiers = []
+        for nom, df in feuilles.items():
+            fichier = nom_fichier_feuille(nom_fichier, nom, self.extension)
+            df.to_csv(fichier, index=False, encoding='utf-8-sig', chunksize=TAILLE_BLOC)
+            fichiers.append(fichier)
+        return fichiers
+
+
+EXPORTEURS = {
+    'xlsx': ExportXlsx,
+    'parquet': ExportParquet,
+    'csv': ExportCsv,
+}
+
+
+def exporter(feuilles, nom_fichier, format_export=None):
+    """Écrit des feuilles {nom: DataFrame} avec le format demandé (déduit de l'extension par défaut)
+
+    Retourne la liste des fichiers écrits.
+    """
+    if format_export is None:
+        format_export = os.path.splitext(nom_fichier)[1].lstrip('.').lower() or 'xlsx'
+    if format_export not in EXPORTEURS:
+        raise ValueError(f"Format d'export inconnu : {format_export} (attendu : {', '.join(EXPORTEURS)})")
+    dossier = os.path.dirname(os.path.abspath(nom_fichier))
+    os.makedirs(dossier, exist_ok=True)
+    return EXPORTEURS[format_export]().ecrire(feuilles, nom_fichier)
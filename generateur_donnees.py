@@ -0,0 +1,220 @@
+import argparse
+import csv
+import json
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Marques -> (part de marché, prix neuf moyen, modèles par popularité décroissante)
+MARQUES = {
+    'Renault': (0.19, 22000, ['Clio', 'Megane', 'Captur', 'Twingo', 'Scenic', 'Kangoo', 'Kadjar', 'Zoe',
+                              'Laguna', 'Espace', 'Modus', 'Talisman', 'Arkana', 'Austral', 'Koleos']),
+    'Peugeot': (0.16, 24000, ['208', '308', '3008', '2008', '207', '206', '5008', 'Partner', '508', '107',
+                              '108', 'Expert']),
+    'Citroen': (0.11, 21000, ['C3', 'C4', 'Berlingo', 'C5', 'C1', 'C4 Picasso', 'DS3', 'Xsara Picasso',
+                              'C3 Aircross', 'Jumpy']),
+    'Volkswagen': (0.08, 28000, ['Golf', 'Polo', 'Tiguan', 'Passat', 'Touran', 'T-Roc', 'Up', 'Transporter']),
+    'Dacia': (0.06, 15000, ['Sandero', 'Duster', 'Logan', 'Lodgy', 'Dokker', 'Spring', 'Jogger']),
+    'Toyota': (0.05, 26000, ['Yaris', 'Aygo', 'C-HR', 'Auris', 'RAV4', 'Corolla']),
+    'Ford': (0.05, 23000, ['Fiesta', 'Focus', 'Kuga', 'C-Max', 'Puma', 'Transit']),
+    'Mercedes-Benz': (0.04, 45000, ['Classe A', 'Classe C', 'Classe E', 'Classe B', 'GLA', 'Vito']),
+    'BMW': (0.04, 42000, ['Serie 1', 'Serie 3', 'X1', 'Serie 5', 'X3', 'Serie 2']),
+    'Audi': (0.04, 40000, ['A3', 'A4', 'Q3', 'A1', 'Q5', 'A6']),
+    'Opel': (0.03, 20000, ['Corsa', 'Astra', 'Mokka', 'Zafira', 'Meriva']),
+    'Fiat': (0.03, 17000, ['500', 'Panda', 'Punto', 'Tipo', 'Doblo']),
+    'Nissan': (0.03, 25000, ['Qashqai', 'Micra', 'Juke', 'X-Trail', 'Leaf']),
+    'Skoda': (0.02, 24000, ['Octavia', 'Fabia', 'Kodiaq', 'Superb']),
+    'Kia': (0.02, 23000, ['Sportage', 'Picanto', 'Ceed', 'Niro']),
+    'Hyundai': (0.02, 23000, ['Tucson', 'i20', 'i10', 'Kona']),
+    'Mini': (0.01, 27000, ['Cooper', 'Countryman', 'One']),
+    'Seat': (0.01, 21000, ['Ibiza', 'Leon', 'Arona', 'Ateca']),
+    'Tesla': (0.005, 50000, ['Model 3', 'Model Y', 'Model S']),
+    'Porsche': (0.005, 90000, ['911', 'Cayenne', 'Macan']),
+}
+CARBURANTS = (['Diesel', 'Essence', 'Hybride', 'Electrique', 'GPL'], [0.45, 0.40, 0.09, 0.05, 0.01])
+BOITES = (['Manuelle', 'Automatique'], [0.7, 0.3])
+LOCALISATIONS = [
+    ('Brest', '29200', 'Finistère'), ('Quimper', '29000', 'Finistère'), ('Rennes', '35000', 'Ille-et-Vilaine'),
+    ('Nantes', '44000', 'Loire-Atlantique'), ('Lorient', '56100', 'Morbihan'), ('Vannes', '56000', 'Morbihan'),
+    ('Saint-Brieuc', '22000', "Côtes-d'Armor"), ('Paris', '75015', 'Paris'), ('Lyon', '69003', 'Rhône'),
+    ('Marseille', '13008', 'Bouches-du-Rhône'), ('Lille', '59000', 'Nord'), ('Bordeaux', '33000', 'Gironde'),
+    ('Toulouse', '31000', 'Haute-Garonne'), ('Amiens', '80000', 'Somme'), ('Firminy', '42700', 'Loire'),
+]
+MOTS_DESCRIPTION = (
+    "véhicule révisé garantie contrôle technique ok distribution faite pneus neufs embrayage "
+    "climatisation gps bluetooth régulateur vitesse radar recul première main carnet entretien "
+    "aucun frais à prévoir reprise possible carte grise faible consommation jantes alu vitres "
+    "électriques direction assistée état impeccable intérieur propre non fumeur"
+).split()
+COLONNES_CSV = ['ID', 'Titre', 'Date Publication', 'Prix', 'Marque', 'Modele', 'Année', 'Kilométrage',
+                'Carburant', 'Boite', 'Etat', 'Puissance din', 'Place', 'Type Vendeur', 'Ville',
+                'Code Postal', 'Département', 'URL', 'Description']
+PART_AFFAIRES = 0.03  # Annonces volontairement sous-évaluées
+PART_INCOMPLETES = 0.01  # Annonces sans marque ou sans prix, comme dans les vraies extractions
+
+
+def _catalogue():
+    """Liste à plat des (marque, modèle, prix neuf) et de leurs probabilités (Zipf par marque)"""
+    marques, modeles, prix_neufs, probabilites = [], [], [], []
+    for marque, (part, prix_neuf, liste) in MARQUES.items():
+        poids = 1 / np.arange(1, len(liste) + 1) ** 1.1
+        for modele, p in zip(liste, poids / poids.sum()):
+            marques.append(marque)
+            modeles.append(modele)
+            prix_neufs.append(prix_neuf)
+            probabilites.append(part * p)
+    probabilites = np.array(probabilites)
+    return np.array(marques), np.array(modeles), np.array(prix_neufs, dtype=float), probabilites / probabilites.sum()
+
+
+def generer_lot(n, rng, premier_id, date_extraction, longueur_description=400):
+    """Génère n annonces au format du CSV de recherche_voitures.js"""
+    marques, modeles, prix_neufs, probabilites = _catalogue()
+    choix = rng.choice(len(marques), size=n, p=probabilites)
+    annee_extraction = date_extraction.year
+
+    age = np.minimum(rng.gamma(2.2, 3.2, n), 25).astype(int)
+    annee = annee_extraction - age
+    km = np.maximum(rng.lognormal(np.log(13000), 0.45, n) * np.maximum(age, 0.3), 50).astype(int)
+    prix = prix_neufs[choix] * 0.86 ** age * np.exp(-km / 400000) * rng.lognormal(0, 0.18, n)
+    affaires = rng.random(n) < PART_AFFAIRES
+    prix[affaires] *= rng.uniform(0.4, 0.7, affaires.sum())
+    prix = np.maximum(np.round(prix, -1), 500).astype(int)
+
+    ids = np.arange(premier_id, premier_id + n)
+    vendeur_pro = rng.random(n) < 0.35
+    localisation = rng.integers(0, len(LOCALISATIONS), n)
+    publication = date_extraction - pd.to_timedelta(rng.integers(0, 30 * 24 * 3600, n), unit='s')
+    mots = np.array(MOTS_DESCRIPTION)
+    nb_mots = max(longueur_description // 8, 1)
+
+    df = pd.DataFrame({
+        'ID': ids,
+        'Titre': [f"{m} {mo} {a}" for m, mo, a in zip(marques[choix], modeles[choix], annee)],
+        'Date Publication': publication.strftime('%Y-%m-%d %H:%M:%S'),
+        'Prix': prix.astype(object),
+        'Marque': marques[choix],
+        'Modele': modeles[choix],
+        'Année': annee.astype(str),
+        'Kilométrage': km.astype(str),
+        'Carburant': rng.choice(CARBURANTS[0], n, p=CARBURANTS[1]),
+        'Boite': rng.choice(BOITES[0], n, p=BOITES[1]),
+        'Etat': 'Non endommagé',
+        'Puissance din': [f"{p} Ch" for p in rng.integers(60, 250, n)],
+        'Place': '5',
+        'Type Vendeur': np.where(vendeur_pro, 'pro', 'private'),
+        'Ville': [LOCALISATIONS[i][0] for i in localisation],
+        'Code Postal': [LOCALISATIONS[i][1] for i in localisation],
+        'Département': [LOCALISATIONS[i][2] for i in localisation],
+        'URL': [f"https://www.leboncoin.fr/ad/voitures/{i}" for i in ids],
+        'Description': [' '.join(rng.choice(mots, nb_mots)) for _ in range(n)],
+    })
+
+    incompletes = rng.random(n) < PART_INCOMPLETES
+    moitie = rng.random(n) < 0.5
+    df.loc[incompletes & moitie, 'Marque'] = ''
+    df.loc[incompletes & ~moitie, 'Prix'] = ''
+    return df
+
+
+def _annonce_json(ligne):
+    """Convertit une ligne du lot au format formatAd de recherche_voitures.js"""
+    return {
+        'id': int(ligne['ID']),
+        'titre': ligne['Titre'],
+        'prix': int(ligne['Prix']) if ligne['Prix'] != '' else None,
+        'date_publication': ligne['Date Publication'],
+        'caracteristiques': {
+            'marque': ligne['Marque'],
+            'modele': ligne['Modele'],
+            'annee': ligne['Année'],
+            'kilometrage': ligne['Kilométrage'],
+            'carburant': ligne['Carburant'],
+            'boite': ligne['Boite'],
+            'etat': ligne['Etat'],
+            'place': ligne['Place'],
+            'horse_power_din': ligne['Puissance din'],
+        },
+        'vendeur': {
+            'type': ligne['Type Vendeur'],
+            'nom': 'Garage' if ligne['Type Vendeur'] == 'pro' else 'Particulier',
+            'pro': ligne['Type Vendeur'] == 'pro',
+        },
+        'localisation': {
+            'ville': ligne['Ville'],
+            'code_postal': ligne['Code Postal'],
+            'departement': ligne['Département'],
+        },
+        'images': [f"https://img.leboncoin.fr/api/v1/lbcpb1/images/{ligne['ID']}_{i}.jpg?rule=ad-image"
+                   for i in range(3)],
+        'url': ligne['URL'],
+        'description': ligne['Description'],
+    }
+
+
+def chemins_fichiers(n, dossier='donnees_synthetiques', date_extraction='2025-01-13'):
+    """Chemins des fichiers CSV et JSON produits par generer_fichiers"""
+    return {
+        'csv': os.path.join(dossier, f"resume_{date_extraction}_Synthetique_{n}V2.csv"),
+        'json': os.path.join(dossier, f"resultats_{date_extraction}_Synthetique_{n}V2.json"),
+    }
+
+
+def generer_fichiers(n, dossier='donnees_synthetiques', formats=('csv', 'json'), graine=0,
+                     taille_lot=100_000, date_extraction='2025-01-13', longueur_description=400):
+    """Écrit n annonces synthétiques en resume_*.csv et/ou resultats_*.json, lot par lot
+
+    Les fichiers suivent les schémas de recherche_voitures.js. Seul un lot est en
+    mémoire à la fois : la taille produite n'est limitée que par le disque.
+    """
+    os.makedirs(dossier, exist_ok=True)
+    rng = np.random.default_rng(graine)
+    date = datetime.strptime(date_extraction, '%Y-%m-%d')
+    chemins = chemins_fichiers(n, dossier, date_extraction)
+    fichiers = {fmt: open(chemins[fmt], 'w', encoding='utf-8', newline='') for fmt in formats}
+    try:
+        if 'csv' in fichiers:
+            fichiers['csv'].write(','.join(COLONNES_CSV) + '\n')
+        if 'json' in fichiers:
+            entete = {
+                'total_annonces': n,
+                'annonces_pro': 0,
+                'annonces_particulier': 0,
+                'date_extraction': (date + timedelta(hours=12)).isoformat() + 'Z',
+            }
+            fichiers['json'].write(json.dumps(entete, indent=2, ensure_ascii=False)[:-2] + ',\n  "annonces": [')
+
+        for debut in range(0, n, taille_lot):
+            lot = generer_lot(min(taille_lot, n - debut), rng, 2_900_000_000 + debut, date, longueur_description)
+            if 'csv' in fichiers:
+                # Comme escapeCsvField : textes entre guillemets, nombres bruts
+                lot.to_csv(fichiers['csv'], header=False, index=False, quoting=csv.QUOTE_NONNUMERIC)
+            if 'json' in fichiers:
+                for i, ligne in enumerate(lot.to_dict('records')):
+                    separateur = ',' if debut + i else ''
+                    annonce = json.dumps(_annonce_json(ligne), indent=2, ensure_ascii=False)
+                    fichiers['json'].write(separateur + '\n    ' + annonce.replace('\n', '\n    '))
+
+        if 'json' in fichiers:
+            fichiers['json'].write('\n  ]\n}')
+    finally:
+        for f in fichiers.values():
+            f.close()
+    return {fmt: chemins[fmt] for fmt in formats}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génère des extractions Leboncoin synthétiques")
+    parser.add_argument('n', type=int, help="Nombre d'annonces")
+    parser.add_argument('--dossier', default='donnees_synthetiques')
+    parser.add_argument('--formats', nargs='+', default=['csv', 'json'], choices=['csv', 'json'])
+    parser.add_argument('--graine', type=int, default=0)
+    parser.add_argument('--longueur-description', type=int, default=400)
+    arguments = parser.parse_args()
+
+    chemins = generer_fichiers(arguments.n, arguments.dossier, arguments.formats, arguments.graine,
+                               longueur_description=arguments.longueur_description)
+    for chemin in chemins.values():
+        print(f"Fichier généré : {chemin}")
@@ -0,0 +1,211 @@
+import argparse
+import json
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from algo_bonne_affaire_v2 import FENETRE_ANNEES, AnalyseurVoitures
+
+VERSION_INDEX = 1
+
+
+class IndexComparables:
+    """Index des comparables pour noter un véhicule sans parcourir tout le jeu de données
+
+    Les annonces sont triées par (Marque, Modele, Année) ; chaque groupe occupe une
+    plage [debut, fin) des tableaux. Une clé croissante (rang du groupe, année) et
+    les sommes cumulées de Prix et Kilométrage donnent la fenêtre ±FENETRE_ANNEES
+    d'un véhicule par deux searchsorted, comme calculer_score_value.
+    """
+
+    def __init__(self, groupes, cle, cumul_prix, cumul_km, annee_min, pas, fenetre=FENETRE_ANNEES):
+        self.groupes = groupes  # (marque, modele) -> (rang, debut, fin)
+        self.cle = cle
+        self.cumul_prix = cumul_prix
+        self.cumul_km = cumul_km
+        self.annee_min = annee_min
+        self.pas = pas
+        self.fenetre = fenetre
+
+    @classmethod
+    def construire(cls, df, fenetre=FENETRE_ANNEES):
+        """Construit l'index à partir d'un DataFrame nettoyé (celui de AnalyseurVoitures)"""
+        df = df[df['Marque'].notna() & df['Modele'].notna() & df['Année'].notna()]
+        table = pd.DataFrame({
+            'Marque': df['Marque'].astype(str).to_numpy(),
+            'Modele': df['Modele'].astype(str).to_numpy(),
+            'Année': df['Année'].to_numpy(dtype=float),
+            'Prix': df['Prix'].to_numpy(dtype=float),
+            'Kilométrage': df['Kilométrage'].to_numpy(dtype=float),
+        }).sort_values(['Marque', 'Modele', 'Année'], kind='stable')
+
+        rang = table.groupby(['Marque', 'Modele'], sort=True).ngroup().to_numpy()
+        annees = table['Année'].to_numpy()
+        annee_min = float(annees.min()) if len(annees) else 0.0
+        pas = (float(annees.max()) - annee_min if len(annees) else 0.0) + 2 * fenetre + 1
+
+        bornes = np.flatnonzero(np.r_[True, rang[1:] != rang[:-1], True]) if len(rang) else np.array([0])
+        groupes = {}
+        for i, (debut, fin) in enumerate(zip(bornes[:-1], bornes[1:])):
+            ligne = table.iloc[debut]
+            groupes[(ligne['Marque'], ligne['Modele'])] = (i, int(debut), int(fin))
+
+        return cls(
+            groupes,
+            cle=rang * pas + (annees - annee_min),
+            cumul_prix=np.r_[0.0, np.cumsum(table['Prix'].to_numpy())],
+            cumul_km=np.r_[0.0, np.cumsum(table['Kilométrage'].to_numpy())],
+            annee_min=annee_min,
+            pas=pas,
+            fenetre=fenetre,
+        )
+
+    @classmethod
+    def depuis_csv(cls, fichier_csv, **options):
+        """Construit l'index depuis un resume_*.csv via le chargement de AnalyseurVoitures"""
+        return cls.construire(AnalyseurVoitures(fichier_csv, **options).df)
+
+    def sauvegarder(self, dossier):
+        """Écrit l'index dans un dossier (tableaux .npy + description des groupes)"""
+        os.makedirs(dossier, exist_ok=True)
+        np.save(os.path.join(dossier, 'cle.npy'), self.cle)
+        np.save(os.path.join(dossier, 'cumul_prix.npy'), self.cumul_prix)
+        np.save(os.path.join(dossier, 'cumul_km.npy'), self.cumul_km)
+        meta = {
+            'version': VERSION_INDEX,
+            'annee_min': self.annee_min,
+            'pas': self.pas,
+            'fenetre': self.fenetre,
+            'groupes': [[marque, modele, *plage] for (marque, modele), plage in self.groupes.items()],
+        }
+        with open(os.path.join(dossier, 'index.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    @classmethod
+    def charger(cls, dossier):
+        """Recharge un index sauvegardé ; les tableaux sont mappés en mémoire"""
+        with open(os.path.join(dossier, 'index.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta['version'] != VERSION_INDEX:
+            raise ValueError(f"Version d'index non supportée : {meta['version']}")
+        return cls(
+            {(marque, modele): tuple(plage) for marque, modele, *plage in meta['groupes']},
+            cle=np.load(os.path.join(dossier, 'cle.npy'), mmap_mode='r'),
+            cumul_prix=np.load(os.path.join(dossier, 'cumul_prix.npy'), mmap_mode='r'),
+            cumul_km=np.load(os.path.join(dossier, 'cumul_km.npy'), mmap_mode='r'),
+            annee_min=meta['annee_min'],
+            pas=meta['pas'],
+            fenetre=meta['fenetre'],
+        )
+
+    def score_many(self, vehicules):
+        """Scores qualité-prix d'une liste de véhicules (dicts) ou d'un DataFrame
+
+        Chaque véhicule fournit Marque, Modele, Année, Prix et Kilométrage ; le score
+        vaut 0 si le modèle est inconnu, s'il a moins de 2 comparables ou si les
+        valeurs sont invalides (ou si l'élément n'est pas un dict).
+        """
+        if isinstance(vehicules, pd.DataFrame):
+            vehicules = vehicules.to_dict('records')
+        n = len(vehicules)
+        rang = np.full(n, -1, dtype=np.int64)
+        debut = np.zeros(n, dtype=np.int64)
+        fin = np.zeros(n, dtype=np.int64)
+        annee, prix, km = np.full(n, np.nan), np.full(n, np.nan), np.full(n, np.nan)
+        for i, vehicule in enumerate(vehicules):
+            if not isinstance(vehicule, dict):
+                continue
+            plage = self.groupes.get((str(vehicule.get('Marque')), str(vehicule.get('Modele'))))
+            if plage is None:
+                continue
+            try:
+                annee[i] = float(vehicule['Année'])
+                prix[i] = float(vehicule['Prix'])
+                km[i] = float(vehicule['Kilométrage'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            rang[i], debut[i], fin[i] = plage
+
+        base = rang * self.pas + (annee - self.annee_min)
+        valides = (rang >= 0) & np.isfinite(base)
+        base = np.where(valides, base, 0)
+        bas = np.clip(np.searchsorted(self.cle, base - self.fenetre, side='left'), debut, fin)
+        haut = np.clip(np.searchsorted(self.cle, base + self.fenetre, side='right'), debut, fin)
+        nombre = haut - bas
+
+        scores = np.zeros(n)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            prix_km_moyen = (self.cumul_prix[haut] - self.cumul_prix[bas]) / (self.cumul_km[haut] - self.cumul_km[bas])
+            calcul = 1 - (prix / km) / prix_km_moyen
+        valides &= (nombre >= 2) & np.isfinite(calcul)
+        scores[valides] = calcul[valides]
+        return scores
+
+    def score(self, vehicule):
+        """Score qualité-prix d'un seul véhicule (dict)"""
+        return float(self.score_many([vehicule])[0])
+
+
+def servir(index, hote='127.0.0.1', port=8765):
+    """Expose l'index en HTTP local : POST /score avec un véhicule ou une liste en JSON"""
+
+    class GestionnaireScore(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != '/score':
+                self.send_error(404)
+                return
+            try:
+                longueur = int(self.headers.get('Content-Length', 0))
+                donnees = json.loads(self.rfile.read(longueur))
+            except ValueError:
+                self.send_error(400, "JSON invalide")
+                return
+            if isinstance(donnees, list):
+                if not all(isinstance(vehicule, dict) for vehicule in donnees):
+                    self.send_error(400, "Chaque élément de la liste doit être un véhicule (objet JSON)")
+                    return
+                reponse = {'scores': index.score_many(donnees).tolist()}
+            elif isinstance(donnees, dict):
+                reponse = {'score': index.score(donnees)}
+            else:
+                self.send_error(400, "Un véhicule ou une liste de véhicules est attendu")
+                return
+            corps = json.dumps(reponse).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(corps)))
+            self.end_headers()
+            self.wfile.write(corps)
+
+        def log_message(self, format, *args):
+            pass
+
+    serveur = ThreadingHTTPServer((hote, port), GestionnaireScore)
+    print(f"Service de score à l'écoute sur http://{hote}:{port}/score")
+    try:
+        serveur.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        serveur.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index des comparables et service de score local")
+    commandes = parser.add_subparsers(dest='commande', required=True)
+    construire = commandes.add_parser('construire', help="Construit l'index depuis un resume_*.csv")
+    construire.add_argument('fichier_csv')
+    construire.add_argument('dossier_index')
+    service = commandes.add_parser('servir', help="Démarre le service HTTP de score")
+    service.add_argument('dossier_index')
+    service.add_argument('--hote', default='127.0.0.1')
+    service.add_argument('--port', type=int, default=8765)
+    arguments = parser.parse_args()
+
+    if arguments.commande == 'construire':
+        IndexComparables.depuis_csv(arguments.fichier_csv).sauvegarder(arguments.dossier_index)
+        print(f"Index enregistré dans {arguments.dossier_index}")
+    else:
+        servir(IndexComparables.charger(arguments.dossier_index), arguments.hote, arguments.port)
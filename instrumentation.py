@@ -0,0 +1,187 @@
+import contextlib
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+from tqdm import tqdm
+
+NOMBRE_FONCTIONS_PROFIL = 25  # Fonctions les plus coûteuses conservées dans le rapport
+
+
+def rss_max_mo():
+    """Pic de mémoire résidente du processus en Mo (None si indisponible, ex. Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 ** 2 if sys.platform == 'darwin' else rss / 1024
+
+
+class EchantillonneurPile:
+    """Profileur par échantillonnage : relève la pile du thread observé à intervalle fixe
+
+    Beaucoup moins intrusif que cProfile sur les boucles serrées ; le rapport compte
+    le nombre d'échantillons où chaque fonction était en cours d'exécution.
+    """
+
+    def __init__(self, intervalle=0.005):
+        self.intervalle = intervalle
+        self.echantillons = Counter()
+        self._thread_observe = threading.get_ident()
+        self._arret = threading.Event()
+        self._thread = threading.Thread(target=self._echantillonner, daemon=True)
+
+    def _echantillonner(self):
+        while not self._arret.wait(self.intervalle):
+            frame = sys._current_frames().get(self._thread_observe)
+            vues = set()
+            while frame is not None:
+                code = frame.f_code
+                vues.add(f"{os.path.basename(code.co_filename)}:{code.co_firstlineno}({code.co_name})")
+                frame = frame.f_back
+            self.echantillons.update(vues)
+
+    def demarrer(self):
+        self._thread.start()
+
+    def arreter(self):
+        self._arret.set()
+        self._thread.join()
+        return [
+            {'fonction': fonction, 'echantillons': nombre}
+            for fonction, nombre in self.echantillons.most_common(NOMBRE_FONCTIONS_PROFIL)
+        ]
+
+
+def mesurer_etape(nom):
+    """Décorateur de méthode : exécute la méthode dans l'étape nom de self.metriques"""
+    def decorateur(methode):
+        @functools.wraps(methode)
+        def enveloppe(self, *args, **kwargs):
+            with self.metriques.etape(nom):
+                return methode(self, *args, **kwargs)
+        return enveloppe
+    return decorateur
+
+
+def _resume_cprofile(profil):
+    """Fonctions les plus coûteuses (temps cumulé) d'un profil cProfile"""
+    stats = pstats.Stats(profil, stream=io.StringIO())
+    lignes = []
+    for (fichier, ligne, fonction), (_, appels, propre, cumule, _) in stats.stats.items():
+        lignes.append({
+            'fonction': f"{os.path.basename(fichier)}:{ligne}({fonction})",
+            'appels': appels,
+            'temps_propre': propre,
+            'temps_cumule': cumule,
+        })
+    lignes.sort(key=lambda x: x['temps_cumule'], reverse=True)
+    return lignes[:NOMBRE_FONCTIONS_PROFIL]
+
+
+class Metriques:
+    """Mesures par étape du pipeline : durée, mémoire, compteurs et profils optionnels
+
+    Chaque étape s'ouvre avec `with metriques.etape('nom'):` (les étapes peuvent
+    s'imbriquer). profils associe un nom d'étape à 'cprofile' ou 'echantillonnage' ;
+    memoire=True active tracemalloc pour le pic d'allocation de chaque étape.
+    progression contrôle l'affichage des barres tqdm du pipeline.
+    """
+
+    def __init__(self, memoire=False, profils=None, progression=True):
+        self.memoire = memoire
+        self.profils = dict(profils or {})
+        self.progression = progression
+        self.debut = datetime.now()
+        self.etapes = []
+        self.compteurs = Counter()
+        self._pile = []
+
+    @contextlib.contextmanager
+    def etape(self, nom):
+        """Mesure un bloc de code comme une étape du pipeline"""
+        chemin = '/'.join([e['nom'] for e in self._pile] + [nom])
+        mesure = {'nom': nom, 'chemin': chemin, 'compteurs': Counter()}
+
+        demarrer_trace = self.memoire and not tracemalloc.is_tracing()
+        if demarrer_trace:
+            tracemalloc.start()
+        if self.memoire:
+            parent = self._pile[-1] if self._pile else None
+            if parent is not None:
+                parent['_pic'] = max(parent.get('_pic', 0), tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+
+        type_profil = self.profils.get(nom)
+        profileur = None
+        if type_profil == 'cprofile':
+            profileur = cProfile.Profile()
+            profileur.enable()
+        elif type_profil == 'echantillonnage':
+            profileur = EchantillonneurPile()
+            profileur.demarrer()
+        elif type_profil is not None:
+            raise ValueError(f"Type de profil inconnu pour l'étape {nom} : {type_profil}")
+
+        self._pile.append(mesure)
+        debut = time.perf_counter()
+        try:
+            yield mesure
+        finally:
+            mesure['secondes'] = time.perf_counter() - debut
+            self._pile.pop()
+            if type_profil == 'cprofile':
+                profileur.disable()
+                mesure['profil'] = _resume_cprofile(profileur)
+            elif type_profil == 'echantillonnage':
+                mesure['profil'] = profileur.arreter()
+            if self.memoire:
+                pic = max(mesure.pop('_pic', 0), tracemalloc.get_traced_memory()[1])
+                mesure['pic_memoire_mo'] = pic / 1024 ** 2
+                if self._pile:
+                    self._pile[-1]['_pic'] = max(self._pile[-1].get('_pic', 0), pic)
+                tracemalloc.reset_peak()
+            if demarrer_trace:
+                tracemalloc.stop()
+            mesure['rss_max_mo'] = rss_max_mo()
+            mesure['compteurs'] = dict(mesure['compteurs'])
+            self.etapes.append(mesure)
+
+    def compter(self, nom, valeur=1):
+        """Incrémente un compteur global et celui de l'étape en cours"""
+        self.compteurs[nom] += int(valeur)
+        if self._pile:
+            self._pile[-1]['compteurs'][nom] += int(valeur)
+
+    def barre(self, iterable, **options):
+        """Barre tqdm si la progression est activée, sinon l'itérable tel quel"""
+        if self.progression:
+            return tqdm(iterable, **options)
+        return iterable
+
+    def rapport(self):
+        """Rapport JSON-sérialisable des étapes et compteurs"""
+        return {
+            'debut': self.debut.isoformat(timespec='seconds'),
+            'duree_totale': (datetime.now() - self.debut).total_seconds(),
+            'etapes': self.etapes,
+            'compteurs': dict(self.compteurs),
+        }
+
+    def ecrire(self, fichier):
+        """Écrit le rapport dans un fichier JSON et retourne son chemin"""
+        dossier = os.path.dirname(os.path.abspath(fichier))
+        os.makedirs(dossier, exist_ok=True)
+        with open(fichier, 'w', encoding='utf-8') as f:
+            json.dump(self.rapport(), f, ensure_ascii=False, indent=2)
+        return fichier
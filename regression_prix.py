@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+VERSION_MODELE = 1
+MIN_ANNONCES_REGRESSION = 10  # En dessous, les pentes du modèle viennent de la marque (ou de l'ensemble)
+RIDGE = 1e-9  # Régularisation relative : une variable constante dans un groupe reçoit une pente nulle
+VARIABLES = ['Kilométrage', 'Année', 'Puissance din']
+NIVEAUX = ['modele', 'marque', 'global']
+
+
+def _moindres_carres_groupes(codes, prix, variables, n_groupes):
+    """Régressions linéaires de prix sur variables pour tous les groupes à la fois
+
+    Les lignes sont triées par groupe ; chaque somme (moyennes, X'X, X'y) est obtenue
+    par np.add.reduceat sur les segments, puis tous les systèmes (p x p) sont résolus
+    ensemble par np.linalg.solve. Les variables sont centrées sur la moyenne du
+    groupe, la constante vaut donc le prix moyen. Une valeur manquante d'une variable
+    est remplacée par la moyenne du groupe (contribution nulle).
+
+    Retourne (effectifs, prix moyens, centres (G, p), pentes (G, p)) ; les groupes sans
+    ligne ont un effectif nul et des valeurs NaN.
+    """
+    p = variables.shape[1]
+    effectifs = np.zeros(n_groupes, dtype=np.int64)
+    constantes = np.full(n_groupes, np.nan)
+    centres = np.full((n_groupes, p), np.nan)
+    pentes = np.full((n_groupes, p), np.nan)
+    if len(codes) == 0:
+        return effectifs, constantes, centres, pentes
+
+    ordre = np.argsort(codes, kind='stable')
+    codes, prix, variables = codes[ordre], prix[ordre], variables[ordre]
+    debuts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    tailles = np.diff(np.r_[debuts, len(codes)])
+    presents = codes[debuts]
+
+    renseignes = ~np.isnan(variables)
+    nombre_renseignes = np.add.reduceat(renseignes, debuts, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        moyennes = np.add.reduceat(np.where(renseignes, variables, 0), debuts, axis=0) / nombre_renseignes
+    moyenne_prix = np.add.reduceat(prix, debuts) / tailles
+    centrees = np.where(renseignes, variables - np.repeat(moyennes, tailles, axis=0), 0)
+    prix_centres = prix - np.repeat(moyenne_prix, tailles)
+
+    xtx = np.empty((len(debuts), p, p))
+    for i in range(p):
+        for j in range(i, p):
+            xtx[:, i, j] = xtx[:, j, i] = np.add.reduceat(centrees[:, i] * centrees[:, j], debuts)
+    xty = np.add.reduceat(centrees * prix_centres[:, None], debuts, axis=0)
+
+    diagonale = np.einsum('gii->gi', xtx)
+    diagonale += RIDGE * diagonale + 1e-12
+    solution = np.linalg.solve(xtx, xty[:, :, None])[:, :, 0]
+
+    effectifs[presents] = tailles
+    constantes[presents] = moyenne_prix
+    centres[presents] = np.where(np.isnan(moyennes), 0, moyennes)
+    pentes[presents] = solution
+    return effectifs, constantes, centres, pentes
+
+
+def _donnees_regression(df):
+    """Annonces utilisables pour l'ajustement : Marque, Modele, Prix et variables en flottants"""
+    colonnes = [col for col in VARIABLES if col in df.columns]
+    donnees = pd.DataFrame({
+        'Marque': df['Marque'].astype(str).to_numpy(),
+        'Modele': df['Modele'].astype(str).to_numpy(),
+        'Prix': pd.to_numeric(df['Prix'], errors='coerce').to_numpy(dtype=float),
+        **{col: pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float) for col in colonnes},
+    })
+    return donnees[df['Marque'].notna().to_numpy() & df['Modele'].notna().to_numpy()
+                   & np.isfinite(donnees[['Prix', 'Kilométrage', 'Année']]).all(axis=1).to_numpy()]
+
+
+def empreinte_donnees(df):
+    """Empreinte BLAKE2b des annonces d'ajustement, indépendante de l'ordre des lignes"""
+    empreinte = hashlib.blake2b(digest_size=16)
+    donnees = _donnees_regression(df)
+    empreinte.update(','.join(donnees.columns).encode())
+    empreinte.update(np.sort(pd.util.hash_pandas_object(donnees, index=False).to_numpy()).tobytes())
+    return empreinte.hexdigest()
+
+
+class ModelePrix:
+    """Modèle de prix par (Marque, Modele) : Prix ~ Kilométrage + Année (+ Puissance din)
+
+    Les modèles de moins de MIN_ANNONCES_REGRESSION annonces reprennent les pentes de
+    leur marque (ou globales) ; la colonne source indique d'où viennent les pentes.
+    """
+
+    def __init__(self, coefficients, min_annonces=MIN_ANNONCES_REGRESSION, empreinte=None, date_ajustement=None):
+        self.coefficients = coefficients
+        self.min_annonces = min_annonces
+        self.empreinte = empreinte
+        self.date_ajustement = date_ajustement
+
+    @classmethod
+    def ajuster(cls, df, min_annonces=MIN_ANNONCES_REGRESSION):
+        """Ajuste les régressions de tous les modèles, marques et de l'ensemble en une passe par niveau"""
+        colonnes = [col for col in VARIABLES if col in df.columns]
+        donnees = _donnees_regression(df)
+        variables = donnees[colonnes].to_numpy()
+
+        niveaux = {}
+        for niveau, cles in [('modele', ['Marque', 'Modele']), ('marque', ['Marque']), ('global', [])]:
+            if cles:
+                groupes = donnees.groupby(cles, sort=True)
+                codes = groupes.ngroup().to_numpy()
+                index = groupes.size().index.to_frame(index=False)
+            else:
+                codes = np.zeros(len(donnees), dtype=np.int64)
+                index = pd.DataFrame(index=[0])
+            effectifs, constantes, centres, pentes = _moindres_carres_groupes(
+                codes, donnees['Prix'].to_numpy(), variables, len(index))
+            table = index.assign(niveau=niveau, nombre_annonces=effectifs, constante=constantes,
+                                 source=np.where(effectifs >= min_annonces, niveau, ''))
+            for k, col in enumerate(colonnes):
+                table[f'centre_{col}'] = centres[:, k]
+                table[f'pente_{col}'] = pentes[:, k]
+            niveaux[niveau] = table
+
+        # Mise en commun : pentes de la marque, puis globales, pour les groupes trop petits
+        pentes = [f'pente_{col}' for col in colonnes]
+        globale = niveaux['global']
+        if not globale.empty:
+            globale.loc[globale['source'] == '', 'source'] = 'global'
+        for niveau, parent, cle in [('marque', 'global', None), ('modele', 'marque', 'Marque')]:
+            table, table_parent = niveaux[niveau], niveaux[parent]
+            petits = (table['source'] == '').to_numpy()
+            if cle is None:
+                lignes_parent = np.zeros(petits.sum(), dtype=np.int64)
+            else:
+                lignes_parent = pd.Index(table_parent[cle]).get_indexer(table.loc[petits, cle])
+            table.loc[petits, pentes] = table_parent[pentes].to_numpy()[lignes_parent]
+            table.loc[petits, 'source'] = table_parent['source'].to_numpy()[lignes_parent]
+
+        coefficients = pd.concat([niveaux[niveau] for niveau in NIVEAUX], ignore_index=True)
+        coefficients = coefficients.reindex(columns=['niveau', 'Marque', 'Modele', 'nombre_annonces', 'source',
+                                                     'constante', *[c for col in colonnes
+                                                                    for c in (f'centre_{col}', f'pente_{col}')]])
+        return cls(coefficients, min_annonces, empreinte_donnees(df), datetime.now().isoformat(timespec='seconds'))
+
+    def variables(self):
+        """Variables explicatives présentes dans les coefficients"""
+        return [col for col in VARIABLES if f'pente_{col}' in self.coefficients.columns]
+
+    def predire(self, df):
+        """Prix prédit de chaque ligne de df (NaN si Kilométrage ou Année manque)"""
+        coefficients = self.coefficients
+        marques = df['Marque'].astype(str).to_numpy()
+        modeles = df['Modele'].astype(str).to_numpy()
+
+        par_modele = coefficients[coefficients['niveau'] == 'modele']
+        par_marque = coefficients[coefficients['niveau'] == 'marque']
+        globale = np.flatnonzero((coefficients['niveau'] == 'global').to_numpy())
+
+        # Ligne de coefficients de chaque annonce : son modèle, sinon sa marque, sinon la ligne globale
+        # (le -1 ajouté en fin de tableau sert de valeur « introuvable » pour get_indexer)
+        index_modeles = pd.MultiIndex.from_arrays([par_modele['Marque'].astype(str), par_modele['Modele'].astype(str)])
+        position = index_modeles.get_indexer(pd.MultiIndex.from_arrays([marques, modeles]))
+        lignes = np.r_[par_modele.index.to_numpy(), -1][position]
+        manquants = lignes < 0
+        if manquants.any():
+            position = pd.Index(par_marque['Marque'].astype(str)).get_indexer(marques[manquants])
+            lignes[manquants] = np.r_[par_marque.index.to_numpy(), -1][position]
+            manquants = lignes < 0
+            lignes[manquants] = globale[0] if len(globale) else -1
+
+        prix_predit = np.full(len(df), np.nan)
+        connus = lignes >= 0
+        if not connus.any():
+            return prix_predit
+        choisis = coefficients.iloc[lignes[connus]]
+        prix_predit[connus] = choisis['constante'].to_numpy()
+        for col in self.variables():
+            valeurs = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float)[connus] if col in df.columns \
+                else np.full(connus.sum(), np.nan)
+            ecart = valeurs - choisis[f'centre_{col}'].to_numpy()
+            if col != 'Puissance din':
+                # Kilométrage ou Année manquant : pas de prédiction, comme l'ancienne formule
+                prix_predit[connus] += choisis[f'pente_{col}'].to_numpy() * ecart
+            else:
+                prix_predit[connus] += np.where(np.isnan(ecart), 0, choisis[f'pente_{col}'].to_numpy() * ecart)
+        return prix_predit
+
+    def sauvegarder(self, fichier):
+        """Écrit les coefficients en JSON (remplacement atomique)"""
+        dossier = os.path.dirname(os.path.abspath(fichier))
+        os.makedirs(dossier, exist_ok=True)
+        contenu = {
+            'version': VERSION_MODELE,
+            'min_annonces': self.min_annonces,
+            'empreinte': self.empreinte,
+            'date_ajustement': self.date_ajustement,
+            # Flottants écrits tels quels (repr exacte), NaN en null
+            'coefficients': self.coefficients.astype(object).where(self.coefficients.notna(), None)
+                                             .to_dict(orient='split', index=False),
+        }
+        temporaire = f"{fichier}.tmp"
+        with open(temporaire, 'w', encoding='utf-8') as f:
+            json.dump(contenu, f, ensure_ascii=False)
+        os.replace(temporaire, fichier)
+
+    @classmethod
+    def charger(cls, fichier):
+        """Recharge des coefficients sauvegardés, sans nouvel ajustement"""
+        with open(fichier, encoding='utf-8') as f:
+            contenu = json.load(f)
+        if contenu['version'] != VERSION_MODELE:
+            raise ValueError(f"Version de modèle de prix non supportée : {contenu['version']}")
+        table = contenu['coefficients']
+        coefficients = pd.DataFrame(table['data'], columns=table['columns'])
+        colonnes_numeriques = [col for col in coefficients.columns
+                               if col.startswith(('centre_', 'pente_')) or col == 'constante']
+        coefficients[colonnes_numeriques] = coefficients[colonnes_numeriques].astype(float)
+        return cls(coefficients, contenu['min_annonces'], contenu.get('empreinte'), contenu.get('date_ajustement'))
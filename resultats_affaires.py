@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+
+TYPES_AFFAIRES = ('Bon rapport qualité-prix', 'Prix anormalement bas')
+COLONNES_ANNONCE = ['ID', 'Marque', 'Modele', 'Prix', 'Année', 'Kilométrage', 'URL']
+COLONNES_SCORES = ['Score_value', 'Prix_predit', 'Économie', 'Pourcentage_économie', 'Nombre_comparables']
+
+
+class ResultatsAffaires:
+    """Bonnes affaires en colonnes : positions des annonces dans df et tableaux de scores
+
+    Rien n'est copié de df avant vers_dataframe : chaque résultat n'est qu'une position
+    (iloc), un code de type (indice dans TYPES_AFFAIRES) et ses valeurs de scores
+    ({colonne: np.ndarray}, NaN quand le score ne concerne pas ce type). Le tri, le
+    filtrage et la sélection par type sont vectorisés et ne copient que ces tableaux.
+    """
+
+    __slots__ = ('df', 'positions', 'types', 'scores')
+
+    def __init__(self, df, positions, types, scores=None):
+        self.df = df
+        self.positions = np.asarray(positions, dtype=np.int64)
+        self.types = np.broadcast_to(np.asarray(types, dtype=np.int8), self.positions.shape).copy()
+        self.scores = {nom: np.asarray(valeurs) for nom, valeurs in (scores or {}).items()}
+
+    @classmethod
+    def vide(cls, df):
+        """Aucun résultat sur df"""
+        return cls(df, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int8))
+
+    @classmethod
+    def concatener(cls, resultats):
+        """Met bout à bout des résultats portant sur le même df
+
+        Un score absent d'une partie vaut NaN pour ses lignes ; comme pour pd.DataFrame sur
+        des dicts, seuls les scores des parties non vides sont conservés.
+        """
+        resultats = list(resultats)
+        df = resultats[0].df
+        if any(r.df is not df for r in resultats):
+            raise ValueError("Les résultats à concaténer doivent porter sur le même DataFrame")
+        noms = list(dict.fromkeys(nom for r in resultats if len(r) for nom in r.scores))
+        scores = {
+            nom: np.concatenate([r.scores[nom] if nom in r.scores else np.full(len(r), np.nan) for r in resultats])
+            for nom in noms
+        }
+        return cls(df, np.concatenate([r.positions for r in resultats]),
+                   np.concatenate([r.types for r in resultats]), scores)
+
+    @classmethod
+    def depuis_tables(cls, tables):
+        """Résultats sur des tables déjà matérialisées {type: DataFrame} (ex. état incrémental)
+
+        Les colonnes d'annonce des tables forment le df des résultats, leurs colonnes de
+        scores deviennent les tableaux de scores.
+        """
+        tables = {type_affaire: table for type_affaire, table in tables.items() if table is not None}
+        if not tables:
+            return cls.vide(pd.DataFrame(columns=COLONNES_ANNONCE))
+        df = pd.concat([table.reindex(columns=COLONNES_ANNONCE) for table in tables.values()], ignore_index=True)
+        parties, debut = [], 0
+        for type_affaire, table in tables.items():
+            scores = {col: table[col].to_numpy() for col in COLONNES_SCORES if col in table.columns}
+            parties.append(cls(df, np.arange(debut, debut + len(table)), TYPES_AFFAIRES.index(type_affaire), scores))
+            debut += len(table)
+        return cls.concatener(parties)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _sous_ensemble(self, selection):
+        """Résultats retenus par un masque booléen ou un tableau d'indices"""
+        return ResultatsAffaires(self.df, self.positions[selection], self.types[selection],
+                                 {nom: valeurs[selection] for nom, valeurs in self.scores.items()})
+
+    def selon_type(self, type_affaire):
+        """Résultats d'un seul type ('Bon rapport qualité-prix' ou 'Prix anormalement bas')"""
+        return self._sous_ensemble(self.types == TYPES_AFFAIRES.index(type_affaire))
+
+    def colonne(self, nom):
+        """Valeurs d'une colonne pour chaque résultat : score, Type ou colonne de df"""
+        if nom in self.scores:
+            return pd.Series(self.scores[nom])
+        if nom == 'Type':
+            return pd.Series(pd.Categorical.from_codes(self.types, categories=TYPES_AFFAIRES))
+        return self.df[nom].iloc[self.positions].reset_index(drop=True)
+
+    def trier(self):
+        """Tri décroissant par Pourcentage_économie, sinon Score_value (ordre stable)"""
+        cle = np.zeros(len(self))
+        for nom in ('Score_value', 'Pourcentage_économie'):
+            if nom in self.scores:
+                valeurs = self.scores[nom].astype(float)
+                cle = np.where(np.isnan(valeurs), cle, valeurs)
+        return self._sous_ensemble(np.argsort(-cle, kind='stable'))
+
+    def filtrer(self, criteres):
+        """Résultats satisfaisant tous les critères {colonne: condition}
+
+        Une condition est un intervalle (min, max) inclusif (None : non borné), une
+        liste ou un ensemble de valeurs admises, une fonction recevant la colonne
+        (pd.Series) et retournant un masque, ou une valeur à égaler. Les colonnes sont
+        celles des résultats exportés (scores, Type ou colonnes de df).
+        """
+        masque = np.ones(len(self), dtype=bool)
+        for nom, condition in criteres.items():
+            valeurs = self.colonne(nom)
+            if callable(condition):
+                garder = condition(valeurs)
+            elif isinstance(condition, tuple):
+                minimum, maximum = condition
+                garder = pd.Series(True, index=valeurs.index)
+                if minimum is not None:
+                    garder &= valeurs >= minimum
+                if maximum is not None:
+                    garder &= valeurs <= maximum
+            elif isinstance(condition, (list, set, frozenset)):
+                garder = valeurs.isin(condition)
+            else:
+                garder = valeurs == condition
+            masque &= np.asarray(garder, dtype=bool)
+        return self._sous_ensemble(masque)
+
+    def vers_dataframe(self, colonnes=None):
+        """Matérialise les résultats (seules les colonnes demandées sont lues dans df)
+
+        Par défaut : colonnes d'annonce et scores présents, dans l'ordre des anciens résultats, puis Type.
+        """
+        if colonnes is None:
+            colonnes = [*COLONNES_ANNONCE[:4], *COLONNES_SCORES[:4], *COLONNES_ANNONCE[4:], COLONNES_SCORES[4], 'Type']
+        return pd.DataFrame({nom: self.colonne(nom) for nom in colonnes
+                             if nom in self.scores or nom == 'Type' or nom in self.df.columns})
@@ -0,0 +1,380 @@
+import argparse
+import asyncio
+import glob
+import io
+import itertools
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from algo_bonne_affaire_v2 import (ECART_TYPE_MAX_ANOMALIE, RATIO_PRIX_ANOMALIE, SCHEMA_CSV, SEUIL_SCORE_VALUE,
+                                   TAILLE_MIN_GROUPE_ANOMALIE, AnalyseurVoitures, _detecter_encodage,
+                                   nettoyer_annonces)
+from analyse_lot import charger_lot, lister_fichiers
+from analyse_voitures import AD_FIELDS, iter_annonces
+from cache_colonnes import DOSSIER_CACHE
+from index_comparables import IndexComparables
+from instrumentation import Metriques
+from resultats_affaires import TYPES_AFFAIRES, ResultatsAffaires
+
+INTERVALLE_SCRUTATION = 1.0  # Secondes entre deux lectures des fichiers surveillés
+INTERVALLE_RAFRAICHISSEMENT = 15 * 60  # Secondes entre deux reconstructions de l'instantané
+TAILLE_EMPREINTE = 64  # Octets relus avant la position pour détecter un fichier réécrit
+NOMBRE_MAX_IDS_VUS = 1_000_000  # Au-delà, les ID vus le plus anciennement sont oubliés
+# Colonne du resume_*.csv -> chemin dans une annonce de resultats_*.json (ceux de analyse_voitures)
+CHAMPS_JSON = {
+    'ID': AD_FIELDS['id'],
+    'Prix': AD_FIELDS['prix'],
+    'Marque': AD_FIELDS['marque'],
+    'Modele': AD_FIELDS['modele'],
+    'Année': AD_FIELDS['annee'],
+    'Kilométrage': AD_FIELDS['kilometrage'],
+    'Carburant': AD_FIELDS['carburant'],
+    'Boite': AD_FIELDS['boite'],
+    'Puissance din': ('caracteristiques', 'horse_power_din'),  # Facultatif, absent de AD_FIELDS
+    'URL': AD_FIELDS['url'],
+}
+
+
+def format_fichier(chemin):
+    """'csv', 'json' ou 'jsonl' selon l'extension (ValueError sinon)"""
+    extension = os.path.splitext(chemin)[1].lstrip('.').lower()
+    if extension not in ('csv', 'json', 'jsonl'):
+        raise ValueError(f"Format de fichier non surveillé : {chemin}")
+    return extension
+
+
+def _annonce_json(annonce):
+    """Annonce du scraper (imbriquée) ou ligne déjà à plat -> dict aux colonnes du CSV
+
+    Les champs vides ('') deviennent None, comme les cellules vides du CSV.
+    """
+    if 'caracteristiques' not in annonce:
+        ligne = {colonne: annonce.get(colonne) for colonne in SCHEMA_CSV}
+    else:
+        ligne = {}
+        for colonne, chemin in CHAMPS_JSON.items():
+            valeur = annonce
+            for cle in chemin:
+                valeur = valeur.get(cle) if isinstance(valeur, dict) else None
+            ligne[colonne] = valeur
+    return {colonne: None if valeur == '' else valeur for colonne, valeur in ligne.items()}
+
+
+class SuiviFichier:
+    """Lecture incrémentale d'un fichier de sortie du scraper
+
+    CSV et JSONL sont lus depuis le dernier octet traité, lignes complètes seulement
+    (la dernière ligne sans retour une fois le fichier stable) ; un resultats_*.json
+    est relu entièrement quand il change.
+    """
+
+    def __init__(self, chemin, delai_stabilite=INTERVALLE_SCRUTATION):
+        self.chemin = chemin
+        self.delai_stabilite = delai_stabilite
+        self.format = format_fichier(chemin)
+        self.encodage = None
+        self.position = 0
+        self.empreinte = b''
+        self.entete = None
+        self.signature = None
+        self.signature_fin = None  # (taille, date) du fichier quand sa dernière ligne était incomplète
+        self.mal_formees = 0
+
+    def _reinitialiser(self):
+        self.position, self.empreinte, self.entete = 0, b'', None
+
+    def _lignes_completes(self):
+        """Octets des nouvelles lignes complètes, position avancée en conséquence"""
+        with open(self.chemin, 'rb') as f:
+            etat = os.fstat(f.fileno())
+            taille = etat.st_size
+            if self.position:
+                f.seek(self.position - len(self.empreinte))
+                if taille < self.position or f.read(len(self.empreinte)) != self.empreinte:
+                    self._reinitialiser()
+                    f.seek(0)
+            donnees = f.read()
+        fin = donnees.rfind(b'\n') + 1
+        if fin < len(donnees):
+            signature = (etat.st_size, etat.st_mtime_ns)
+            if signature == self.signature_fin or time.time() - etat.st_mtime >= self.delai_stabilite:
+                fin = len(donnees)  # Fichier stable : sa dernière ligne est terminée
+            self.signature_fin = signature
+        if fin == 0:
+            return b''
+        self.position += fin
+        self.empreinte = donnees[max(fin - TAILLE_EMPREINTE, 0):fin]
+        return donnees[:fin]
+
+    def lire_nouvelles(self):
+        """Nouvelles annonces brutes du fichier (DataFrame aux colonnes du CSV, valeurs non nettoyées)"""
+        if self.format == 'json':
+            return self._lire_json()
+        if self.encodage is None:
+            self.encodage = _detecter_encodage(self.chemin)
+        texte = self._lignes_completes().decode(self.encodage, errors='replace')
+        if not texte:
+            return pd.DataFrame(columns=list(SCHEMA_CSV))
+        if self.format == 'jsonl':
+            return self._lire_jsonl(texte)
+
+        if self.entete is None:
+            premiere, _, texte = texte.partition('\n')
+            self.entete = pd.read_csv(io.StringIO(premiere), nrows=0).columns.tolist()
+        if not texte.strip():
+            return pd.DataFrame(columns=list(SCHEMA_CSV))
+        df = pd.read_csv(io.StringIO(texte), names=self.entete, header=None, dtype=str,
+                         usecols=lambda colonne: colonne in SCHEMA_CSV)
+        return df.reindex(columns=list(SCHEMA_CSV))
+
+    def _lire_jsonl(self, texte):
+        lignes = []
+        for ligne in texte.splitlines():
+            if not ligne.strip():
+                continue
+            try:
+                annonce = json.loads(ligne)
+            except json.JSONDecodeError:
+                self.mal_formees += 1
+                continue
+            if isinstance(annonce, dict):
+                lignes.append(_annonce_json(annonce))
+            else:
+                self.mal_formees += 1
+        return pd.DataFrame(lignes, columns=list(SCHEMA_CSV))
+
+    def _lire_json(self):
+        etat = os.stat(self.chemin)
+        signature = (etat.st_size, etat.st_mtime_ns)
+        if signature == self.signature:
+            return pd.DataFrame(columns=list(SCHEMA_CSV))
+        try:
+            with open(self.chemin, encoding='utf-8') as f:
+                lignes = [_annonce_json(annonce) for annonce in iter_annonces(f) if isinstance(annonce, dict)]
+        except (ValueError, UnicodeDecodeError):
+            return pd.DataFrame(columns=list(SCHEMA_CSV))  # Écriture en cours : relu au tour suivant
+        self.signature = signature
+        return pd.DataFrame(lignes, columns=list(SCHEMA_CSV))
+
+
+class InstantaneMarche:
+    """Statistiques de marché figées pour noter de nouvelles annonces sans tout recalculer
+
+    L'index des comparables donne le score qualité-prix, le modèle de prix le prix
+    prédit, et la taille et l'écart-type des prix de chaque (Marque, Modele) écartent
+    les groupes que detecter_anomalies_prix ignore. Les annonces notées ne font pas
+    partie de l'instantané : seules ses annonces servent de comparables.
+    """
+
+    def __init__(self, index, modele_prix, groupes, date=None):
+        self.index = index
+        self.modele_prix = modele_prix
+        self.groupes = groupes  # DataFrame indexé par (Marque, Modele) : nombre_annonces, ecart_type_prix
+        self.date = date or datetime.now()
+
+    @classmethod
+    def depuis_analyseur(cls, analyseur):
+        """Instantané des données d'un AnalyseurVoitures"""
+        agregats = analyseur.agregats_modeles()[['nombre_annonces', 'ecart_type_prix']]
+        agregats.index = pd.MultiIndex.from_arrays([agregats.index.get_level_values(niveau).astype(str)
+                                                    for niveau in range(agregats.index.nlevels)])
+        return cls(IndexComparables.construire(analyseur.df), analyseur.modele_prix_ajuste(), agregats)
+
+    @classmethod
+    def depuis_fichiers(cls, motifs, dossier_cache=DOSSIER_CACHE, metriques=None):
+        """Instantané des resume_*.csv désignés par motifs (relus via le cache colonnaire)"""
+        metriques = metriques or Metriques(progression=False)
+        df = charger_lot(lister_fichiers(motifs), dossier_cache=dossier_cache, metriques=metriques)
+        return cls.depuis_analyseur(AnalyseurVoitures.depuis_dataframe(df, metriques))
+
+    def noter(self, annonces):
+        """Bonnes affaires parmi des annonces nettoyées (ResultatsAffaires sur annonces, trié)"""
+        scores = self.index.score_many(annonces)
+        bons = np.flatnonzero(scores > SEUIL_SCORE_VALUE)
+
+        cles = pd.MultiIndex.from_arrays([annonces['Marque'].astype(str), annonces['Modele'].astype(str)])
+        lignes = self.groupes.index.get_indexer(cles)
+        connus = lignes >= 0
+        taille = np.where(connus, self.groupes['nombre_annonces'].to_numpy()[lignes], 0)
+        ecart_type = np.where(connus, self.groupes['ecart_type_prix'].to_numpy(dtype=float)[lignes], np.nan)
+        prix = annonces['Prix'].to_numpy(dtype=float)
+        prix_predit = self.modele_prix.predire(annonces)
+        groupe_retenu = (taille >= TAILLE_MIN_GROUPE_ANOMALIE) & ~(ecart_type > ECART_TYPE_MAX_ANOMALIE)
+        anomalies = np.flatnonzero(groupe_retenu & (prix < RATIO_PRIX_ANOMALIE * prix_predit))
+
+        return ResultatsAffaires.concatener([
+            ResultatsAffaires(annonces, bons, TYPES_AFFAIRES.index('Bon rapport qualité-prix'),
+                              {'Score_value': scores[bons]}),
+            ResultatsAffaires(annonces, anomalies, TYPES_AFFAIRES.index('Prix anormalement bas'), {
+                'Prix_predit': prix_predit[anomalies],
+                'Économie': prix_predit[anomalies] - prix[anomalies],
+                'Pourcentage_économie': (prix_predit[anomalies] - prix[anomalies]) / prix_predit[anomalies] * 100,
+                'Nombre_comparables': taille[anomalies],
+            }),
+        ]).trier()
+
+
+def ecrire_affaires(sortie=None):
+    """Émetteur par défaut : une ligne par affaire à l'écran et, avec sortie, en JSONL"""
+    def emettre(affaires):
+        for affaire in affaires.itertuples(index=False):
+            print(f"[{affaire.Type}] {affaire.Marque} {affaire.Modele} {affaire.Prix:.0f} € "
+                  f"({affaire.Latence_s:.1f} s) {affaire.URL}")
+        if sortie:
+            with open(sortie, 'a', encoding='utf-8') as f:
+                texte = affaires.to_json(orient='records', lines=True, force_ascii=False)
+                f.write(texte if texte.endswith('\n') or not texte else texte + '\n')
+    return emettre
+
+
+class Surveillance:
+    """Mode surveillance : note les nouvelles annonces dès que le scraper les écrit
+
+    Les bonnes affaires sont passées à emettre ; construire_instantane rafraîchit
+    l'instantané en arrière-plan toutes les intervalle_rafraichissement secondes.
+    """
+
+    def __init__(self, motifs, instantane, construire_instantane=None, emettre=None,
+                 intervalle=INTERVALLE_SCRUTATION, intervalle_rafraichissement=INTERVALLE_RAFRAICHISSEMENT,
+                 depuis_debut=False, exclus=(), metriques=None, nombre_max_ids_vus=NOMBRE_MAX_IDS_VUS):
+        self.motifs = list(motifs)
+        self.instantane = instantane
+        self.construire_instantane = construire_instantane
+        self.emettre = emettre or ecrire_affaires()
+        self.intervalle = intervalle
+        self.intervalle_rafraichissement = intervalle_rafraichissement
+        self.depuis_debut = depuis_debut
+        self.exclus = {os.path.abspath(chemin) for chemin in exclus}
+        self.metriques = metriques or Metriques(progression=False)
+        self.suivis = {}
+        self.vues = {}  # ID -> None, dans l'ordre où ils ont été vus
+        self.nombre_max_ids_vus = nombre_max_ids_vus
+
+    def _fichiers(self):
+        fichiers = []
+        for motif in self.motifs:
+            for chemin in sorted(glob.glob(motif)):
+                chemin = os.path.abspath(chemin)
+                if chemin not in self.exclus and os.path.isfile(chemin) and chemin not in fichiers:
+                    fichiers.append(chemin)
+        return fichiers
+
+    @staticmethod
+    def _lire(suivi):
+        """Tâche d'un thread : nouvelles annonces nettoyées d'un fichier, lignes rejetées et date d'écriture"""
+        date_ecriture = os.path.getmtime(suivi.chemin)
+        brut = suivi.lire_nouvelles()
+        lues = len(brut)
+        annonces = nettoyer_annonces(brut).reset_index(drop=True)
+        return annonces, lues - len(annonces), date_ecriture
+
+    def _nouvelles(self, annonces):
+        """Annonces dont l'ID n'a jamais été vu (les annonces sans ID sont gardées)"""
+        ids = annonces['ID']
+        # Recherche ligne par ligne dans self.vues : isin reconstruirait une table de tous les ID vus
+        deja_vues = np.fromiter(map(self.vues.__contains__, ids.tolist()), dtype=bool, count=len(ids))
+        nouvelles = annonces[~deja_vues & ~(ids.duplicated(keep='last') & ids.notna()).to_numpy()]
+        self.vues.update(dict.fromkeys(nouvelles['ID'].dropna().tolist()))
+        for id_annonce in list(itertools.islice(self.vues, max(len(self.vues) - self.nombre_max_ids_vus, 0))):
+            del self.vues[id_annonce]
+        return nouvelles.reset_index(drop=True)
+
+    async def scruter(self, emettre=True):
+        """Un tour : lit les fichiers surveillés et émet les bonnes affaires des nouvelles annonces"""
+        for chemin in self._fichiers():
+            if chemin not in self.suivis:
+                self.suivis[chemin] = SuiviFichier(chemin, self.intervalle)
+        suivis = list(self.suivis.values())
+        lectures = await asyncio.gather(*(asyncio.to_thread(self._lire, suivi) for suivi in suivis),
+                                        return_exceptions=True)
+
+        nombre = 0
+        for suivi, lecture in zip(suivis, lectures):
+            if isinstance(lecture, FileNotFoundError):
+                del self.suivis[suivi.chemin]  # Fichier supprimé ou déplacé
+                continue
+            if isinstance(lecture, Exception):
+                print(f"Lecture impossible de {suivi.chemin} : {lecture}")
+                continue
+            annonces, rejetees, date_ecriture = lecture
+            self.metriques.compter('lignes_rejetees', rejetees)
+            if annonces.empty:
+                continue
+            annonces = self._nouvelles(annonces)
+            if annonces.empty or not emettre:
+                continue
+            nombre += len(annonces)
+            affaires = (await asyncio.to_thread(self.instantane.noter, annonces)).vers_dataframe()
+            if not affaires.empty:
+                affaires['Fichier'] = os.path.basename(suivi.chemin)
+                affaires['Latence_s'] = time.time() - date_ecriture
+                self.metriques.compter('affaires_emises', len(affaires))
+                self.emettre(affaires)
+        self.metriques.compter('annonces_surveillees', nombre)
+        self.metriques.compter('annonces_mal_formees', sum(s.mal_formees for s in suivis))
+        for suivi in suivis:
+            suivi.mal_formees = 0
+        return nombre
+
+    async def _rafraichir(self):
+        while True:
+            await asyncio.sleep(self.intervalle_rafraichissement)
+            debut = time.perf_counter()
+            try:
+                instantane = await asyncio.to_thread(self.construire_instantane)
+            except Exception as erreur:
+                print(f"Rafraîchissement de l'instantané impossible ({erreur}), ancien instantané conservé")
+                continue
+            self.instantane = instantane
+            self.metriques.compter('rafraichissements')
+            print(f"Instantané de marché rafraîchi en {time.perf_counter() - debut:.1f} s")
+
+    async def executer(self, duree=None):
+        """Surveille jusqu'à interruption, ou pendant duree secondes"""
+        await self.scruter(emettre=self.depuis_debut)
+        rafraichissement = None
+        if self.construire_instantane is not None:
+            rafraichissement = asyncio.create_task(self._rafraichir())
+        fin = None if duree is None else time.monotonic() + duree
+        try:
+            while fin is None or time.monotonic() < fin:
+                await asyncio.sleep(self.intervalle)
+                await self.scruter()
+        finally:
+            if rafraichissement is not None:
+                rafraichissement.cancel()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Note les nouvelles annonces dès que le scraper les écrit")
+    parser.add_argument('motifs', nargs='+', help="Fichiers surveillés (CSV, JSON ou JSONL), ex. 'resume_*V2.csv'")
+    parser.add_argument('--references', nargs='+', required=True,
+                        help="resume_*.csv servant à construire l'instantané de marché")
+    parser.add_argument('--dossier-cache', default=DOSSIER_CACHE)
+    parser.add_argument('--sortie', help="Fichier JSONL où ajouter les bonnes affaires détectées")
+    parser.add_argument('--intervalle', type=float, default=INTERVALLE_SCRUTATION)
+    parser.add_argument('--rafraichissement', type=float, default=INTERVALLE_RAFRAICHISSEMENT,
+                        help="Secondes entre deux reconstructions de l'instantané")
+    parser.add_argument('--depuis-debut', action='store_true', help="Note aussi les annonces déjà présentes")
+    parser.add_argument('--duree', type=float, help="Arrête la surveillance après ce nombre de secondes")
+    arguments = parser.parse_args()
+
+    def construire():
+        return InstantaneMarche.depuis_fichiers(arguments.references, arguments.dossier_cache)
+
+    print("Construction de l'instantané de marché...")
+    surveillance = Surveillance(arguments.motifs, construire(), construire, ecrire_affaires(arguments.sortie),
+                                arguments.intervalle, arguments.rafraichissement, arguments.depuis_debut,
+                                exclus=[arguments.sortie] if arguments.sortie else ())
+    print(f"Surveillance de {', '.join(arguments.motifs)} (Ctrl+C pour arrêter)")
+    try:
+        asyncio.run(surveillance.executer(arguments.duree))
+    except KeyboardInterrupt:
+        pass
+    metriques = surveillance.metriques.compteurs
+    print(f"{metriques['annonces_surveillees']} nouvelles annonces notées, {metriques['affaires_emises']} affaires émises")
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from algo_bonne_affaire_v2 import AnalyseurVoitures  # noqa: E402
+from generateur_donnees import generer_fichiers  # noqa: E402
+from instrumentation import Metriques  # noqa: E402
+
+NOMBRE_ANNONCES = 3000
+
+
+def charger(fichier_csv):
+    """DataFrame nettoyé d'un resume_*.csv, comme le charge AnalyseurVoitures"""
+    return AnalyseurVoitures(str(fichier_csv), metriques=Metriques(progression=False)).df
+
+
+@pytest.fixture(scope='session')
+def fichiers_jours(tmp_path_factory):
+    """Deux extractions synthétiques consécutives : (jour 1, jour 2)
+
+    Le jour 2 retire 200 annonces, change le prix de 300 autres et en ajoute 400.
+    """
+    dossier = tmp_path_factory.mktemp('donnees')
+    jour_1 = generer_fichiers(NOMBRE_ANNONCES, str(dossier), formats=('csv',), graine=1)['csv']
+    nouvelles = generer_fichiers(400, str(dossier / 'nouvelles'), formats=('csv',), graine=2)['csv']
+
+    df = pd.read_csv(jour_1, dtype=str, keep_default_na=False)
+    ajouts = pd.read_csv(nouvelles, dtype=str, keep_default_na=False)
+    ajouts['ID'] = (ajouts['ID'].astype('int64') + 10_000_000).astype(str)
+    df = df.iloc[200:].copy()
+    modifiees = df.index[:300]
+    prix = pd.to_numeric(df.loc[modifiees, 'Prix'], errors='coerce')
+    df.loc[modifiees, 'Prix'] = (prix * 0.8).round().astype('Int64').astype(str).replace('<NA>', '')
+    jour_2 = dossier / 'resume_2025-01-14_Synthetique_jour2V2.csv'
+    pd.concat([df, ajouts]).to_csv(jour_2, index=False)
+    return jour_1, str(jour_2)
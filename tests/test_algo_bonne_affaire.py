@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from algo_bonne_affaire_v2 import AnalyseurVoitures
+from conftest import charger
+from instrumentation import Metriques
+
+NOMBRE_ANNONCES_EQUIVALENCE = 1000  # Le calcul ligne par ligne filtre tout le DataFrame par véhicule
+
+
+@pytest.fixture(scope='module')
+def analyseur(fichiers_jours):
+    df = charger(fichiers_jours[0]).iloc[:NOMBRE_ANNONCES_EQUIVALENCE]
+    return AnalyseurVoitures.depuis_dataframe(df, Metriques(progression=False))
+
+
+def _anomalies_fixe_reference(df):
+    """Ancienne détection des anomalies (coefficients fixes), groupe par groupe et ligne par ligne"""
+    resultats = []
+    for _, groupe in df.groupby(['Marque', 'Modele'], observed=True):
+        taille_groupe = len(groupe)
+        if taille_groupe < 3 or groupe['Prix'].std() > 10_000:
+            continue
+        prix_moyen = groupe['Prix'].mean()
+        km_impact = -0.1 * (groupe['Kilométrage'] - groupe['Kilométrage'].mean()) / 10000
+        annee_impact = 0.05 * (groupe['Année'] - groupe['Année'].mean())
+        prix_predit = prix_moyen * (1 + km_impact + annee_impact)
+        for idx, row in groupe.iterrows():
+            prix_predit_vehicule = prix_predit.loc[idx]
+            if row['Prix'] < 0.75 * prix_predit_vehicule:
+                resultats.append({
+                    'ID': row['ID'],
+                    'Marque': row['Marque'],
+                    'Modele': row['Modele'],
+                    'Prix': row['Prix'],
+                    'Prix_predit': prix_predit_vehicule,
+                    'Économie': prix_predit_vehicule - row['Prix'],
+                    'Pourcentage_économie': ((prix_predit_vehicule - row['Prix']) / prix_predit_vehicule) * 100,
+                    'Année': row['Année'],
+                    'Kilométrage': row['Kilométrage'],
+                    'URL': row['URL'],
+                    'Nombre_comparables': taille_groupe,
+                })
+    return pd.DataFrame(resultats)
+
+
+@pytest.mark.parametrize('execution', ['serie', 'processus'])
+def test_scores_vectorises_egaux_au_calcul_ligne_par_ligne(analyseur, execution):
+    attendus = [analyseur.calculer_score_value(vehicule) for _, vehicule in analyseur.df.iterrows()]
+    scores = analyseur.calculer_scores_value(execution=execution, n_workers=2)
+    assert (np.asarray(attendus) > 0).any()
+    np.testing.assert_allclose(scores.to_numpy(), attendus, rtol=1e-9, atol=1e-12)
+
+
+def test_anomalies_fixe_egales_a_l_ancien_calcul(analyseur):
+    attendu = _anomalies_fixe_reference(analyseur.df)
+    obtenu = analyseur.detecter_anomalies_prix(methode='fixe').vers_dataframe(list(attendu.columns))
+    assert len(attendu)
+    pd.testing.assert_frame_equal(obtenu, attendu, check_dtype=False, check_categorical=False)
+
+
+def test_batch_non_contigu_retrouve_ses_positions(fichiers_jours):
+    analyseur = AnalyseurVoitures.depuis_dataframe(charger(fichiers_jours[0]), Metriques(progression=False))
+    batch = analyseur.df.iloc[::3]
+
+    resultats = analyseur.calculer_scores_par_batch(batch)
+    assert len(resultats)
+    np.testing.assert_array_equal(resultats.colonne('ID'), batch['ID'].iloc[resultats.positions // 3])
+    np.testing.assert_allclose(resultats.scores['Score_value'],
+                               [analyseur.calculer_score_value(analyseur.df.iloc[p]) for p in resultats.positions])
+
+
+def test_chargements_complet_et_par_morceaux_identiques(tmp_path):
+    fichier = tmp_path / 'resume_2025-01-13_testV2.csv'
+    fichier.write_text("ID,Prix,Marque,Modele,Année,Kilométrage,Puissance din,URL\n"
+                       "1,12.5,Renault,Clio,2015,120 000 km,90 Ch,u1\n"
+                       "2,8 900 €,Peugeot,208,2018,45000,1.2.3,u2\n"
+                       "3,,Peugeot,208,2018,45000,110,u3\n", encoding='utf-8')
+    complet = AnalyseurVoitures(str(fichier), metriques=Metriques(progression=False)).df
+    morceaux = AnalyseurVoitures(str(fichier), basse_memoire=True, metriques=Metriques(progression=False)).df
+    for colonne in ['ID', 'Prix', 'Année', 'Kilométrage', 'Puissance din']:
+        np.testing.assert_array_equal(complet[colonne].to_numpy(dtype=float), morceaux[colonne].to_numpy(dtype=float))
+    assert complet['Prix'].tolist() == [12.5, 8900]
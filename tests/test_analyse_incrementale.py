@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+from algo_bonne_affaire_v2 import AnalyseurVoitures
+from analyse_incrementale import PRECISION_CROQUIS, AnalyseIncrementale, CroquisQuantiles
+from conftest import charger
+from instrumentation import Metriques
+
+
+@pytest.mark.parametrize('valeurs', [[100, 300], [100, 200, 300, 400], [1000, 1500, 2000, 40000, 41000, 90000]])
+def test_mediane_croquis_interpolee(valeurs):
+    croquis = CroquisQuantiles()
+    croquis.mettre_a_jour(croquis.indices(valeurs), [1] * len(valeurs))
+    attendu = (sorted(valeurs)[(len(valeurs) - 1) // 2] + sorted(valeurs)[len(valeurs) // 2]) / 2
+    assert croquis.quantile(0.5) == pytest.approx(attendu, rel=PRECISION_CROQUIS)
+
+
+def test_tendances_incrementales_egales_au_calcul_complet(tmp_path, fichiers_jours):
+    jour_1, jour_2 = (charger(fichier) for fichier in fichiers_jours)
+    dossier_etat = str(tmp_path / 'etat')
+    metriques = Metriques(progression=False)
+
+    etat = AnalyseIncrementale(dossier_etat)
+    etat.mettre_a_jour(jour_1, metriques)
+    etat.sauvegarder()
+    etat = AnalyseIncrementale(dossier_etat)
+    etat.mettre_a_jour(jour_2, metriques)
+
+    incremental = etat.tendances()
+    complet = AnalyseurVoitures.depuis_dataframe(jour_2, metriques).analyser_tendances_marche()
+    assert incremental.keys() == complet.keys()
+    for modele, attendu in complet.items():
+        obtenu = incremental[modele]
+        assert obtenu['nombre_annonces'] == attendu['nombre_annonces'], modele
+        assert obtenu['prix_median'] == pytest.approx(attendu['prix_median'], rel=PRECISION_CROQUIS), modele
+        for cle in ('prix_moyen', 'ecart_type_prix', 'km_moyen', 'age_moyen', 'prix_min', 'prix_max'):
+            assert obtenu[cle] == pytest.approx(attendu[cle], rel=1e-9), (modele, cle)
+
+
+def test_etat_garde_un_seul_modele_de_prix(tmp_path, fichiers_jours):
+    jour_1, jour_2 = (charger(fichier) for fichier in fichiers_jours)
+    dossier_etat = str(tmp_path / 'etat')
+    metriques = Metriques(progression=False)
+
+    etat = AnalyseIncrementale(dossier_etat)
+    etat.mettre_a_jour(jour_1, metriques)
+    etat.sauvegarder()
+    etat = AnalyseIncrementale(dossier_etat)
+    coefficients_veille = etat.modele_prix.coefficients
+    etat.mettre_a_jour(jour_2, metriques)
+    pd.testing.assert_frame_equal(etat.modele_prix.coefficients, coefficients_veille)
+
+    # Groupes modifiés ou non, toutes les anomalies viennent des coefficients de l'état
+    complet = AnalyseurVoitures.depuis_dataframe(jour_2, metriques, etat.modele_prix)
+    attendu = complet.detecter_anomalies_prix().vers_dataframe().drop(columns='Type')
+    trier = lambda table: table.sort_values('ID').reset_index(drop=True)
+    pd.testing.assert_frame_equal(trier(etat.anomalies), trier(attendu), check_dtype=False, check_categorical=False)
+
+    resume = etat.mettre_a_jour(jour_2, metriques, reajuster_modele=True)
+    assert resume['groupes_recalcules'] == jour_2.groupby(['Marque', 'Modele'], observed=True).ngroups
@@ -0,0 +1,101 @@
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import pytest
+from matplotlib.cbook import boxplot_stats
+
+from analyse_voitures import (deal_scores, price_box_stats, price_km_density, rank_deals, render_charts,
+                              yearly_fuel_means)
+
+
+@pytest.fixture(scope='module')
+def annonces():
+    """Annonces au format load_clean_data, kilométrage en texte comme dans les JSON"""
+    generateur = np.random.default_rng(5)
+    n = 5000
+    kilometrage = generateur.integers(1000, 300_000, n)
+    return pd.DataFrame({
+        'id': np.arange(n),
+        'marque': generateur.choice(['Renault', 'Peugeot', 'Citroën', 'Dacia'], n),
+        'prix': generateur.integers(1000, 40_000, n).astype(float),
+        'annee': generateur.integers(2000, 2024, n),
+        'kilometrage': [f"{km:,} km".replace(',', ' ') for km in kilometrage],
+        'carburant': generateur.choice(['Essence', 'Diesel', 'Électrique'], n),
+        'vendeur_type': generateur.choice(['pro', 'particulier', None], n),
+    })
+
+
+@pytest.fixture(scope='module')
+def annonces_nettoyees(annonces):
+    """Les mêmes annonces après clean_data : kilométrage numérique"""
+    return annonces.assign(kilometrage=annonces['kilometrage'].str.replace(' km', '').str.replace(' ', '').astype(float))
+
+
+def _reference(annonces):
+    reference = annonces.copy()
+    reference['score'] = deal_scores(annonces, 2025)
+    return reference
+
+
+@pytest.mark.parametrize('chunk_size', [700, 100_000])
+def test_rank_deals_global_comme_nsmallest(annonces, chunk_size):
+    resultat = rank_deals(annonces, {None: 50}, 2025, chunk_size=chunk_size)[None]
+    attendu = _reference(annonces).nsmallest(50, 'score')
+    assert resultat.index.tolist() == attendu.index.tolist()
+
+
+@pytest.mark.parametrize('chunk_size', [700, 100_000])
+def test_rank_deals_par_marque_comme_head(annonces, chunk_size):
+    resultat = rank_deals(annonces, {'marque': 10}, 2025, chunk_size=chunk_size)['marque']
+    attendu = _reference(annonces).sort_values(['marque', 'score'], kind='stable').groupby('marque').head(10)
+    assert resultat.index.tolist() == attendu.index.tolist()
+
+
+def test_rank_deals_prix_par_km_sur_kilometrage_nettoye(annonces):
+    resultat = rank_deals(annonces, {None: 20}, 2025)[None]
+    kilometrage = resultat['kilometrage'].str.replace(' ', '').str.removesuffix('km').astype(float)
+    np.testing.assert_allclose(resultat['prix_par_km'], resultat['prix'] / kilometrage)
+    assert resultat['prix_par_km'].notna().all()
+
+
+def test_price_box_stats_comme_boxplot_stats(annonces):
+    for stats in price_box_stats(annonces):
+        attendu = boxplot_stats(annonces.loc[annonces['marque'] == stats['label'], 'prix'].to_numpy(), whis=1.5)[0]
+        for cle in ['q1', 'med', 'q3', 'whislo', 'whishi']:
+            assert stats[cle] == pytest.approx(attendu[cle])
+        assert stats['outliers'] == len(attendu['fliers'])
+    assert [stats['label'] for stats in price_box_stats(annonces)] == sorted(annonces['marque'].unique())
+
+
+def test_price_km_density_compte_chaque_type_de_vendeur(annonces_nettoyees):
+    km_edges, prix_edges, counts = price_km_density(annonces_nettoyees, bins=(10, 8), panels=2)
+    assert len(km_edges) == 11 and len(prix_edges) == 9
+    vendeurs = annonces_nettoyees['vendeur_type'].fillna('inconnu')
+    assert list(counts) == vendeurs.value_counts().index[:2].tolist()
+    for vendeur, compte in counts.items():
+        donnees = annonces_nettoyees[vendeurs == vendeur]
+        attendu = np.histogram2d(donnees['kilometrage'], donnees['prix'], bins=(km_edges, prix_edges))[0]
+        np.testing.assert_array_equal(compte, attendu)
+
+
+def test_yearly_fuel_means_comme_pivot_table(annonces):
+    attendu = annonces.pivot_table(index='annee', columns='carburant', values='prix', aggfunc='mean')
+    pd.testing.assert_frame_equal(yearly_fuel_means(annonces), attendu, check_names=False, check_dtype=False,
+                                  check_index_type=False)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_render_charts_ne_change_pas_le_backend(tmp_path, monkeypatch, annonces_nettoyees, workers):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'analyses').mkdir()
+    backend = matplotlib.get_backend()
+    plt.switch_backend('svg')
+    try:
+        fichiers = render_charts(annonces_nettoyees, workers=workers)
+        assert matplotlib.get_backend() == 'svg'
+    finally:
+        plt.switch_backend(backend)
+    assert [nom.split('/')[-1] for nom in fichiers] == ['prix_par_marque.png', 'prix_km_vendeur.png',
+                                                        'evolution_prix_carburant.png']
+    assert all((tmp_path / fichier).stat().st_size > 0 for fichier in fichiers)
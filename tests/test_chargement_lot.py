@@ -0,0 +1,34 @@
+import pandas as pd
+import pytest
+
+from analyse_lot import charger_lot
+from analyse_voitures import load_clean_data, load_clean_files
+from generateur_donnees import generer_fichiers
+from instrumentation import Metriques
+
+
+@pytest.fixture(scope='module')
+def fichiers_json(tmp_path_factory):
+    """Deux extractions JSON dont la seconde reprend les annonces de la première"""
+    dossier = tmp_path_factory.mktemp('json')
+    return [generer_fichiers(n, str(dossier / date), formats=('json',), graine=3, date_extraction=date)['json']
+            for n, date in [(500, '2025-01-13'), (800, '2025-01-14')]]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_load_clean_files_garde_la_version_la_plus_recente(tmp_path, fichiers_json, workers):
+    df = load_clean_files(fichiers_json, cache_dir=str(tmp_path / 'cache'), metrics=Metriques(progression=False),
+                          workers=workers)
+    attendu = pd.concat([load_clean_data(fichier) for fichier in fichiers_json]).drop_duplicates('id', keep='last')
+    pd.testing.assert_frame_equal(df.reset_index(drop=True), attendu.reset_index(drop=True), check_dtype=False,
+                                  check_categorical=False)
+
+
+def test_charger_lot_relit_le_cache(tmp_path, fichiers_jours):
+    dossier_cache = str(tmp_path / 'cache')
+    premier = charger_lot(list(fichiers_jours), n_workers=1, dossier_cache=dossier_cache,
+                          metriques=Metriques(progression=False))
+    metriques = Metriques(progression=False)
+    depuis_cache = charger_lot(list(fichiers_jours), n_workers=1, dossier_cache=dossier_cache, metriques=metriques)
+    pd.testing.assert_frame_equal(depuis_cache, premier)
+    assert 'lignes_lues' not in metriques.compteurs
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analyse_lot import charger_lot
+from doublons_annonces import detecter_reposts, regrouper_reposts
+from instrumentation import Metriques
+
+DESCRIPTION = ("Clio IV dCi 90 Intens, première main, carnet d'entretien à jour, distribution faite à "
+               "95 000 km, pneus neufs, GPS, climatisation automatique, radar de recul, non fumeur")
+
+
+def _annonces(textes=True):
+    df = pd.DataFrame({
+        'ID': [101, 102, 103, 104],
+        'Marque': 'Renault', 'Modele': 'Clio', 'Année': 2018, 'Kilométrage': 100_000,
+        'Carburant': 'Diesel', 'Boite': 'Manuelle', 'Puissance din': 90,
+        'Prix': [11_500, 11_200, 9_900, 12_800],
+        'URL': ['u1', 'u2', 'u3', 'u4'],
+        'Titre': ['Renault Clio IV dCi 90 Intens', 'Renault Clio IV dCi 90 Intens',
+                  'Clio 4 1.5 dCi Zen', 'Clio dCi business société'],
+        'Description': [DESCRIPTION, DESCRIPTION + ' - prix en baisse',
+                        "Vendue cause déménagement, rayure porte arrière, embrayage à prévoir bientôt",
+                        "Véhicule de société entretenu en concession, factures, TVA récupérable"],
+        'Ville': ['Brest', 'Brest', 'Quimper', 'Rennes'],
+    })
+    return df if textes else df.drop(columns=['Titre', 'Description', 'Ville'])
+
+
+def test_repost_regroupe_et_annonces_differentes_gardees():
+    df = _annonces()
+    groupes = detecter_reposts(df)
+    assert groupes[0] == groupes[1]
+    assert len(np.unique(groupes)) == 3
+
+    gardees = regrouper_reposts(df, groupes)
+    assert gardees['ID'].tolist() == [102, 103, 104]  # Le repost le plus récent remplace l'original
+
+
+def test_reposts_refuses_sans_texte():
+    # Mêmes attributs, voitures différentes : sans texte, elles seraient toutes fusionnées
+    with pytest.raises(ValueError):
+        detecter_reposts(_annonces(textes=False))
+
+
+def test_charger_lot_lit_les_textes_pour_les_reposts(tmp_path, fichiers_jours):
+    df = charger_lot([fichiers_jours[0]], n_workers=1, dossier_cache=str(tmp_path / 'cache'),
+                     metriques=Metriques(progression=False), colonnes_texte=True)
+    assert {'Titre', 'Description', 'Ville'} <= set(df.columns)
+    assert len(np.unique(detecter_reposts(df))) > 0.9 * len(df)
@@ -0,0 +1,18 @@
+import os
+
+import pytest
+
+from algo_bonne_affaire_v2 import AnalyseurVoitures
+from conftest import charger
+from instrumentation import Metriques
+
+
+@pytest.mark.parametrize('format_export', ['xlsx', 'csv'])
+def test_rapport_retourne_les_fichiers_ecrits(tmp_path, monkeypatch, fichiers_jours, format_export):
+    analyseur = AnalyseurVoitures.depuis_dataframe(charger(fichiers_jours[0]), Metriques(progression=False))
+    monkeypatch.chdir(tmp_path)
+
+    fichiers = analyseur.generer_rapport_complet(format_export=format_export)
+    assert fichiers and all(os.path.isfile(fichier) for fichier in fichiers)
+    assert all(fichier.endswith(f'.{format_export}') for fichier in fichiers)
+    assert len(list(tmp_path.glob('*_metriques.json'))) == 1
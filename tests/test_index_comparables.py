@@ -0,0 +1,15 @@
+import numpy as np
+
+from conftest import charger
+from index_comparables import IndexComparables
+
+
+def test_elements_non_dict_ont_un_score_nul(fichiers_jours):
+    df = charger(fichiers_jours[0])
+    index = IndexComparables.construire(df)
+    vehicules = df.head(20).to_dict('records')
+
+    attendus = index.score_many(vehicules)
+    scores = index.score_many([1, *vehicules, None, 'Clio', [vehicules[0]]])
+    assert scores[0] == 0 and not scores[-3:].any()
+    np.testing.assert_array_equal(scores[1:-3], attendus)
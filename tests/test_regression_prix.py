@@ -0,0 +1,28 @@
+import pandas as pd
+
+from algo_bonne_affaire_v2 import AnalyseurVoitures
+from conftest import charger
+from instrumentation import Metriques
+from regression_prix import ModelePrix, empreinte_donnees
+
+
+def test_modele_sauvegarde_reutilise_jusqu_au_reajustement(tmp_path, fichiers_jours):
+    jour_1, jour_2 = (charger(fichier) for fichier in fichiers_jours)
+    fichier_modele = str(tmp_path / 'modele_prix.json')
+    metriques = Metriques(progression=False)
+
+    premier = AnalyseurVoitures.depuis_dataframe(jour_1, metriques)
+    premier.fichier_modele_prix = fichier_modele
+    modele_jour_1 = premier.modele_prix_ajuste()
+    sauvegarde = ModelePrix.charger(fichier_modele)
+    assert sauvegarde.empreinte == empreinte_donnees(jour_1) and sauvegarde.date_ajustement
+
+    # Extraction suivante : coefficients du fichier réutilisés sans nouvel ajustement
+    lendemain = AnalyseurVoitures.depuis_dataframe(jour_2, metriques)
+    lendemain.fichier_modele_prix = fichier_modele
+    pd.testing.assert_frame_equal(lendemain.modele_prix_ajuste().coefficients, modele_jour_1.coefficients)
+
+    # Réajustement explicite : nouveaux coefficients, fichier remplacé
+    reajuste = lendemain.modele_prix_ajuste(reajuster=True)
+    pd.testing.assert_frame_equal(reajuste.coefficients, ModelePrix.ajuster(jour_2).coefficients)
+    assert ModelePrix.charger(fichier_modele).empreinte == empreinte_donnees(jour_2)
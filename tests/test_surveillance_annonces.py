@@ -0,0 +1,73 @@
+import io
+import json
+
+import pandas as pd
+
+from algo_bonne_affaire_v2 import SCHEMA_CSV, charger_donnees_par_chunks
+from surveillance_annonces import SuiviFichier, Surveillance, nettoyer_annonces
+
+CSV = """ID,Prix,Marque,Modele,Année,Kilométrage,Puissance din,URL
+1,12.5,Renault,Clio,2015,120 000 km,90 Ch,u1
+2,8 900 €,Peugeot,208,2018,45000,,u2
+3,,Peugeot,208,2018,45000,110,u3
+"""
+
+
+def test_nettoyage_surveillance_identique_au_chargement(tmp_path):
+    fichier = tmp_path / 'resume_2025-01-13_testV2.csv'
+    fichier.write_text(CSV, encoding='utf-8')
+    charge = charger_donnees_par_chunks(str(fichier))
+    brut = pd.read_csv(io.StringIO(CSV), dtype=str).reindex(columns=list(SCHEMA_CSV))
+    surveille = nettoyer_annonces(brut)
+    for colonne in ['ID', 'Prix', 'Année', 'Kilométrage', 'Puissance din']:
+        pd.testing.assert_series_equal(surveille[colonne].astype(float), charge[colonne].astype(float))
+    assert charge['Prix'].tolist() == [12.5, 8900]
+
+
+def test_nombres_json_gardes_tels_quels():
+    brut = pd.DataFrame({'ID': [1, 2], 'Prix': [12500.0, '12 500 €'], 'Année': [2015, '2016'],
+                         'Kilométrage': ['80 000 km', 80000.0], 'Puissance din': [110.0, None]})
+    df = nettoyer_annonces(brut)
+    assert df['Prix'].tolist() == [12500, 12500]
+    assert df['Kilométrage'].tolist() == [80000, 80000]
+
+
+def test_ids_vus_bornes():
+    surveillance = Surveillance([], instantane=None, nombre_max_ids_vus=3)
+    for debut in range(0, 10, 2):
+        nouvelles = surveillance._nouvelles(pd.DataFrame({'ID': [debut, debut + 1]}))
+        assert nouvelles['ID'].tolist() == [debut, debut + 1]
+    assert list(surveillance.vues) == [7, 8, 9]
+    assert surveillance._nouvelles(pd.DataFrame({'ID': [9, 10]}))['ID'].tolist() == [10]
+
+
+def test_derniere_ligne_sans_retour_lue_quand_le_fichier_est_stable(tmp_path):
+    fichier = tmp_path / 'resume_2025-01-13_testV2.csv'
+    fichier.write_text(CSV.rstrip('\n'), encoding='utf-8')  # Comme rows.join('\n') du scraper
+    suivi = SuiviFichier(str(fichier), delai_stabilite=3600)
+    assert suivi.lire_nouvelles()['ID'].tolist() == ['1', '2']
+    assert suivi.lire_nouvelles()['ID'].tolist() == ['3']
+    assert suivi.lire_nouvelles().empty
+
+    ancien = SuiviFichier(str(fichier), delai_stabilite=0)
+    assert ancien.lire_nouvelles()['ID'].tolist() == ['1', '2', '3']
+
+
+def test_json_relu_en_flux_quand_il_est_complet(tmp_path):
+    annonces = [{'id': 1, 'prix': 12500, 'url': 'u1',
+                 'caracteristiques': {'marque': 'Renault', 'modele': 'Clio', 'annee': '2015',
+                                      'kilometrage': '80 000 km', 'horse_power_din': '90 Ch'}},
+                {'id': 2, 'prix': 8900, 'url': 'u2', 'caracteristiques': {'marque': 'Peugeot'}}]
+    contenu = json.dumps({'date_extraction': '2025-01-13', 'annonces': annonces})
+    fichier = tmp_path / 'resultats_2025-01-13.json'
+    fichier.write_text(contenu[:len(contenu) // 2], encoding='utf-8')
+    suivi = SuiviFichier(str(fichier))
+    assert suivi.lire_nouvelles().empty  # Écriture en cours
+
+    fichier.write_text(contenu, encoding='utf-8')
+    df = suivi.lire_nouvelles()
+    assert df.columns.tolist() == list(SCHEMA_CSV)
+    assert df['ID'].tolist() == [1, 2]
+    assert df.loc[0, 'Puissance din'] == '90 Ch' and df.loc[0, 'Kilométrage'] == '80 000 km'
+    assert pd.isna(df.loc[1, 'Modele'])
+    assert suivi.lire_nouvelles().empty  # Inchangé depuis la dernière lecture